@@ -1,30 +1,43 @@
-from collections import OrderedDict
+from collections import ChainMap, namedtuple, OrderedDict
+from concurrent import futures
 import contextlib
 import copy
+import functools
 from difflib import SequenceMatcher
+import glob
+import hashlib
 
 import json
+import multiprocessing
 import operator
 import os
 import re
+import shutil
+import tempfile
+import threading
 import time
+import traceback
+import uuid
+import weakref
 
 import h5py
 import jinja2
 import netCDF4
 import numpy as np
-import pyparsing
 import rdflib
 import rdflib.collection
+import rdflib.graph
 import rdflib.namespace
 import requests
 import six
 
-from bald import datetime, distribution
+from bald import cachestore, cdf, datetime, distribution, terms
 import bald.validation as bv
 
 __version__ = '0.3.1'
 
+BALD_ONTOLOGY_URI = 'https://www.opengis.net/def/binary-array-ld'
+
 def _graph_html():
     return('''<html>
 <head>
@@ -239,58 +252,652 @@ def is_http_uri(item):
     return result
 
 
+class CacheStats(object):
+    """
+    Counters and latency histograms for an :class:`HttpCache`.
+
+    Lookups are counted per uri as hits (served without a network request),
+    misses (fetched from the network) or failures (no response).  Fetch and
+    parse latencies, in seconds, are counted into histogram buckets, each
+    bucket holding the events no slower than its upper bound.
+
+    """
+    buckets = (0.001, 0.01, 0.1, 1., 10., 100., float('inf'))
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self._lock = threading.Lock()
+        self.uris = {}
+        self.fetch_latency = [0] * len(self.buckets)
+        self.parse_latency = [0] * len(self.buckets)
+
+    def _bucket(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                return i
+
+    def record(self, uri, event, seconds=None, nbytes=0, **details):
+        """
+        Record an event: one of 'hit', 'miss', 'failure' or 'parse'.
+
+        """
+        with self._lock:
+            counts = self.uris.setdefault(
+                uri, {'hit': 0, 'miss': 0, 'failure': 0, 'parse': 0,
+                      'bytes': 0, 'fetch_seconds': 0., 'parse_seconds': 0.})
+            counts[event] += 1
+            counts['bytes'] += nbytes
+            if event == 'parse':
+                counts['parse_seconds'] += seconds
+                self.parse_latency[self._bucket(seconds)] += 1
+            elif seconds is not None and details.get('source') != 'memory':
+                counts['fetch_seconds'] += seconds
+                self.fetch_latency[self._bucket(seconds)] += 1
+        if self.on_event is not None:
+            record = {'uri': uri, 'event': event, 'seconds': seconds,
+                      'bytes': nbytes}
+            record.update(details)
+            self.on_event(record)
+
+    def summary(self):
+        """
+        Return a dictionary of the totals, latency histograms and per-uri
+        counts recorded.
+
+        """
+        with self._lock:
+            uris = copy.deepcopy(self.uris)
+            fetch_latency = list(self.fetch_latency)
+            parse_latency = list(self.parse_latency)
+        result = {}
+        for key in ('hit', 'miss', 'failure', 'parse', 'bytes',
+                    'fetch_seconds', 'parse_seconds'):
+            result[key] = sum(counts[key] for counts in uris.values())
+        result['fetch_latency'] = list(zip(self.buckets, fetch_latency))
+        result['parse_latency'] = list(zip(self.buckets, parse_latency))
+        result['uris'] = uris
+        return result
+
+    def slowest(self, count=10):
+        """
+        Return the uris which have spent longest being fetched and parsed,
+        slowest first, with their total seconds.
+
+        """
+        with self._lock:
+            totals = [(counts['fetch_seconds'] + counts['parse_seconds'], uri)
+                      for uri, counts in self.uris.items()]
+        totals.sort(reverse=True)
+        return [(uri, seconds) for seconds, uri in totals[:count]]
+
+
 class HttpCache(object):
     """
     Requests cache.
+
+    Responses are held in memory for the life of the cache; if a store is
+    given, they are also stored persistently, so that they may be shared
+    between processes and reused by later runs.
+
+    Args:
+
+        * cache_dir - a directory for an on-disk store, or None
+        * ttl - the number of seconds a stored entry remains fresh
+        * max_size - the maximum total size, in bytes, of the on-disk store
+        * store - a persistent store, such as a
+                  :class:`bald.cachestore.SqliteCache`, to use instead of
+                  an on-disk store
+        * max_workers - the number of threads used by prefetch
+        * session - a requests.Session to make requests with; by default
+                    each thread uses its own session, all sharing one
+                    keep-alive connection pool
+        * pool_connections - the number of hosts to keep connection pools
+                             for
+        * pool_maxsize - the maximum number of connections kept per host,
+                         max_workers by default
+        * backoff - the number of seconds a failed uri is not retried for;
+                    this doubles with each consecutive failure
+        * max_backoff - the upper limit on the backoff, in seconds
+        * breaker_threshold - the number of consecutive failures from a
+                              host after which requests to that host are
+                              refused without trying
+        * breaker_timeout - the number of seconds a host is refused for
+                            before one request is allowed to try it again
+        * retry_budget - the total number of seconds this cache may spend
+                         retrying failed requests, or None for no limit
+        * stale_while_revalidate - if True, an expired stored entry is
+                                   returned at once and revalidated in the
+                                   background; otherwise it is revalidated
+                                   before it is returned
+        * bundle - a vocabulary bundle, or the path to one, whose responses
+                   are used in preference to any other source
+        * offline - if True, no network requests are made: uris which are
+                    not bundled or stored get a null response
+        * on_event - a callable, passed a dictionary describing each
+                     lookup and parse as it happens, for logging
+        * snapshot_dir - a directory in which to keep snapshots of the
+                         compiled vocabularies of each set of alias and
+                         prefix URIs, so later loads of files with the same
+                         set need not rebuild them while their responses
+                         are unchanged; these are pickles, so the directory
+                         must be trusted
+
     """
-    def __init__(self):
+    def __init__(self, cache_dir=None, ttl=None, max_size=None, store=None,
+                 max_workers=8, session=None, pool_connections=10,
+                 pool_maxsize=None, backoff=60, max_backoff=86400,
+                 breaker_threshold=3, breaker_timeout=60, retry_budget=None,
+                 stale_while_revalidate=False, bundle=None, offline=False,
+                 on_event=None, snapshot_dir=None):
         self.cache = {}
+        self.checked = {}
+        self.stats = CacheStats(on_event=on_event)
+        self.graphs = {}
+        self.graph_formats = {}
+        self.contexts = {}
+        self.context_maps = {}
+        self._versions = {}
+        # distinguishes the vocabulary states compiled with this cache
+        self.identity = uuid.uuid4().hex
+        self.failures = {}
+        self.max_workers = max_workers
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_timeout = breaker_timeout
+        self.retry_budget = retry_budget
+        self.stale_while_revalidate = stale_while_revalidate
+        self._retry_spent = 0.
+        self._revalidating = {}
+        self._circuits = {}
+        self._lock = threading.Lock()
+        if pool_maxsize is None:
+            pool_maxsize = max_workers
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self._session = session
+        self._local = threading.local()
+        if store is None and cache_dir is not None:
+            store = cachestore.DiskCache(cache_dir, ttl=ttl, max_size=max_size)
+        self.store = store
+        if isinstance(bundle, six.string_types):
+            bundle = cachestore.VocabularyBundle(bundle)
+        self.bundle = bundle
+        self.offline = offline
+        self.snapshots = None
+        if snapshot_dir is not None:
+            self.snapshots = cachestore.SnapshotStore(snapshot_dir, ttl=ttl)
+
+    def __getstate__(self):
+        # locks, threads and parsed graphs belong to this process; a copy
+        # keeps the responses and stores, and records its own statistics
+        state = self.__dict__.copy()
+        for key in ('_lock', '_local', '_revalidating', 'graphs', 'stats'):
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._revalidating = {}
+        self.graphs = {}
+        self.stats = CacheStats()
 
     def is_http_uri(self, item):
         return is_http_uri(item)
 
-    def __getitem__(self, item):
+    @property
+    def session(self):
+        """
+        The requests.Session for the calling thread.
 
-        if not self.is_http_uri(item):
-            raise ValueError('{} is not a HTTP URI.'.format(item))
-        if item not in self.cache:
-            # null response, as a fall back
-            self.cache[item] = requests.models.Response()
-            # now = time.time()
-            try:
-                # print('trying: {}'.format(item))
+        """
+        if self._session is not None:
+            return self._session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            self._local.session = session
+        return session
+
+    def _retry_timeout(self, timeout):
+        """
+        Return the timeout allowed for a retry, limited by the remaining
+        retry budget, or None if the budget is spent.
 
-                headers = {'Accept': 'application/rdf+xml'}
-                self.cache[item] = requests.get(item, headers=headers, timeout=11)
-            except Exception:
+        """
+        with self._lock:
+            if self.retry_budget is None:
+                return timeout
+            remaining = self.retry_budget - self._retry_spent
+        if remaining <= 0:
+            return None
+        return min(timeout, remaining)
+
+    def _fetch(self, item, validators=None):
+        # null response, as a fall back
+        response = requests.models.Response()
+        try:
+            # print('trying: {}'.format(item))
+
+            headers = {'Accept': 'application/rdf+xml'}
+            if validators:
+                headers.update(validators)
+            response = self.session.get(item, headers=headers, timeout=11)
+        except Exception:
+            timeout = self._retry_timeout(64)
+            if timeout is not None:
+                then = time.time()
                 try:
                     # print('retrying: {}'.format(item))
                     headers = {'Accept': 'text/html'}
-                    self.cache[item] = requests.get(item, headers=headers, timeout=64)
+                    response = self.session.get(item, headers=headers,
+                                                timeout=timeout)
                 except Exception:
                     pass
+                with self._lock:
+                    self._retry_spent += time.time() - then
+        return response
+
+    def _host(self, item):
+        return six.moves.urllib.parse.urlparse(item).netloc
+
+    def _circuit_open(self, item):
+        """
+        Return True if requests to the host of this uri are currently
+        refused.
+
+        """
+        host = self._host(item)
+        with self._lock:
+            failures, opened = self._circuits.get(host, (0, 0))
+            if failures < self.breaker_threshold:
+                return False
+            if time.time() - opened >= self.breaker_timeout:
+                # half open: let this request try the host again
+                self._circuits[host] = (failures, time.time())
+                return False
+            return True
+
+    def _failure(self, item):
+        failure = self.failures.get(item)
+        if failure is None and self.store is not None:
+            failure = self.store.get_failure(item)
+        return failure
+
+    def _record_failure(self, item, failure):
+        failures = 1
+        if failure is not None:
+            failures = failure['failures'] + 1
+        delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+        failure = {'failures': failures, 'retry_after': time.time() + delay}
+        self.failures[item] = failure
+        if self.store is not None:
+            self.store.set_failure(item, failure)
+        host = self._host(item)
+        with self._lock:
+            host_failures, _ = self._circuits.get(host, (0, 0))
+            self._circuits[host] = (host_failures + 1, time.time())
+
+    def _record_success(self, item):
+        self.failures.pop(item, None)
+        with self._lock:
+            self._circuits.pop(self._host(item), None)
+
+    def _revalidate(self, item, stale):
+        """
+        Revalidate a stale stored response with a conditional request,
+        returning the response to use and its source.
+
+        Only a 200 response replaces the stored one: if the uri cannot be
+        reached, or the server returns an error, the stale response is
+        used (stale-if-error), and the failure backs off further
+        revalidation as it would a fetch.
+
+        """
+        failure = self._failure(item)
+        if ((failure is not None and time.time() < failure['retry_after']) or
+                self._circuit_open(item)):
+            return stale, 'stale'
+        validators = {}
+        if stale.headers.get('ETag'):
+            validators['If-None-Match'] = stale.headers['ETag']
+        if stale.headers.get('Last-Modified'):
+            validators['If-Modified-Since'] = stale.headers['Last-Modified']
+        response = self._fetch(item, validators)
+        source = 'network'
+        if response.status_code == 304:
+            self._record_success(item)
+            refreshed = dict((key, response.headers[key]) for key in
+                             ('ETag', 'Last-Modified', 'Cache-Control',
+                              'Expires', 'Date') if key in response.headers)
+            self.store.refresh(item, refreshed)
+            stale.headers.update(refreshed)
+            response, source = stale, 'revalidated'
+        elif response.status_code == 200:
+            self._record_success(item)
+            self.store.set(item, response)
+        else:
+            # unreachable, or an error, so the stale response is the best
+            # available
+            self._record_failure(item, failure)
+            response, source = stale, 'stale'
+        return response, source
+
+    def _revalidate_later(self, item, stale):
+        def _run():
+            try:
+                self._revalidate(item, stale)
+            finally:
+                with self._lock:
+                    self._revalidating.pop(item, None)
+
+        with self._lock:
+            if item in self._revalidating:
+                return
+            thread = threading.Thread(target=_run)
+            thread.daemon = True
+            self._revalidating[item] = thread
+        thread.start()
+
+    def wait(self):
+        """
+        Wait for any background revalidations to complete.
+
+        """
+        with self._lock:
+            threads = list(self._revalidating.values())
+        for thread in threads:
+            thread.join()
+
+    def _resolve(self, item):
+        """
+        Return the response for an item which is not held in memory, and
+        the source it came from.
+
+        """
+        if self.bundle is not None and item in self.bundle:
+            return self.bundle.get(item), 'bundle'
+        if self.store is not None:
+            response, fresh = self.store.entry(item)
+            if response is not None and (fresh or self.offline):
+                return response, 'store'
+            elif response is not None and self.stale_while_revalidate:
+                # later lookups within this process keep the stale response
+                self._revalidate_later(item, response)
+                return response, 'stale'
+            elif response is not None:
+                return self._revalidate(item, response)
+        if self.offline:
+            return requests.models.Response(), 'offline'
+        # negative cache and circuit breaker: fail fast, without a request
+        failure = self._failure(item)
+        if failure is not None and time.time() < failure['retry_after']:
+            return requests.models.Response(), 'negative'
+        if self._circuit_open(item):
+            return requests.models.Response(), 'circuit'
+        if self.store is not None and not self.store.claim(item):
+            # another process is fetching this uri, so use its response
+            response = self.store.wait_for(item)
+            if response is not None:
+                return response, 'shared'
+            failure = self._failure(item)
+            if failure is not None and time.time() < failure['retry_after']:
+                return requests.models.Response(), 'negative'
+        try:
+            response = self._fetch(item)
+            # only store responses which the server actually returned
+            if response.status_code is None:
+                self._record_failure(item, failure)
+            else:
+                self._record_success(item)
+                if self.store is not None:
+                    self.store.set(item, response)
+        finally:
+            if self.store is not None:
+                self.store.release(item)
+        return response, 'network'
+
+    def __getitem__(self, item):
+
+        if not self.is_http_uri(item):
+            raise ValueError('{} is not a HTTP URI.'.format(item))
+        if item in self.cache:
+            self.stats.record(item, 'hit', source='memory')
+        else:
+            then = time.time()
+            response, source = self._resolve(item)
+            self.cache[item] = response
+            if response.status_code is None:
+                event = 'failure'
+            elif source == 'network':
+                event = 'miss'
+            else:
+                event = 'hit'
+            nbytes = 0
+            if source == 'network' and response.content:
+                nbytes = len(response.content)
+            self.stats.record(item, event, source=source,
+                              seconds=time.time() - then, nbytes=nbytes)
 
-        # print('in {} seconds'.format(time.time() - then))
         return self.cache[item]
 
-    def check_uri(self, uri):
-        result = False
-        if self[uri].status_code == 200:
-            result = True
+    def prefetch(self, uris):
+        """
+        Fetch all of the given uris which are not already cached,
+        concurrently, so that the total wait is that of the slowest uri.
+        Items which are not HTTP URIs are ignored.
+
+        """
+        pending = []
+        for uri in uris:
+            if (self.is_http_uri(uri) and uri not in self.cache and
+                    uri not in pending):
+                pending.append(uri)
+        if len(pending) == 1:
+            self[pending[0]]
+        elif pending:
+            workers = min(self.max_workers, len(pending))
+            with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(self.__getitem__, pending))
+
+    def graph(self, uri, formats=('xml', 'n3')):
+        """
+        Return a read-only rdflib graph parsed from the response for the uri,
+        or None if it cannot be parsed as any of the formats.
+
+        Each format is tried in turn, starting with any which has parsed
+        this uri before.  Parsed graphs are cached by uri and format, so
+        each response is parsed at most once per format.
+
+        """
+        response = self[uri]
+        known = self.graph_formats.get(uri)
+        if known in formats:
+            formats = (known,) + tuple(f for f in formats if f != known)
+        for fmt in formats:
+            key = (uri, fmt)
+            if key not in self.graphs:
+                then = time.time()
+                agraph = rdflib.Graph()
+                try:
+                    agraph.parse(data=response.text, format=fmt)
+                    agraph = rdflib.graph.ReadOnlyGraphAggregate([agraph])
+                except Exception:
+                    agraph = None
+                self.graphs[key] = agraph
+                self.stats.record(uri, 'parse', seconds=time.time() - then,
+                                  format=fmt, parsed=agraph is not None)
+            if self.graphs[key] is not None:
+                self.graph_formats[uri] = fmt
+                return self.graphs[key]
+        return None
+
+    def version(self, uri):
+        """
+        Return a validator of the response for the uri: its ETag or
+        Last-Modified header, or else a hash of its content.  Returns None
+        if the uri is not a HTTP URI or its response is not a 200.
+
+        """
+        if not self.is_http_uri(uri):
+            return None
+        response = self[uri]
+        known = self._versions.get(uri)
+        if known is not None and known[0] is response:
+            return known[1]
+        result = None
+        if response.status_code == 200:
+            if response.headers.get('ETag'):
+                result = 'etag:{}'.format(response.headers['ETag'])
+            elif response.headers.get('Last-Modified'):
+                result = 'last-modified:{}'.format(
+                    response.headers['Last-Modified'])
+            else:
+                digest = hashlib.sha256(response.content or b'').hexdigest()
+                result = 'sha256:{}'.format(digest)
+        self._versions[uri] = (response, result)
+        return result
+
+    def versions(self, uris):
+        """
+        Return the versions of the responses for the uris, as a sorted tuple
+        of (uri, version) pairs, which identifies the content a graph built
+        from them has.
+
+        """
+        return tuple(sorted((uri, self.version(uri)) for uri in set(uris)))
+
+    def _context_key(self, prefix_context):
+        if prefix_context.startswith(('http://', 'https://')):
+            return prefix_context
+        digest = hashlib.sha256(prefix_context.encode('utf-8')).hexdigest()
+        return 'sha256:{}'.format(digest)
+
+    def _context(self, prefix_context):
+        # the prefixes of one JSON-LD context, keyed 'pref__'
+        if prefix_context.startswith(('http://', 'https://')):
+            prefcon = json.loads(self[prefix_context].text)
+        else:
+            prefcon = json.loads(prefix_context)
+        result = {}
+        if '@context' in prefcon:
+            for key in prefcon['@context']:
+                result['{}__'.format(key)] = prefcon['@context'][key]
         return result
 
+    def context_prefixes(self, prefix_contexts):
+        """
+        Return the dictionary of prefixes, keyed 'pref__', defined by the
+        JSON-LD @context of the prefix_contexts, each of which is a URI or
+        a JSON document.  Prefixes which the contexts define differently
+        are left out.
+
+        Contexts are decoded and merged once per sequence of contexts, and
+        cached by URI or content hash: the result is shared, so must not
+        be modified.
+
+        """
+        key = tuple(self._context_key(c) for c in prefix_contexts)
+        if key not in self.contexts:
+            if len(key) == 1:
+                context_prefixes = self._context(prefix_contexts[0])
+            else:
+                context_prefixes = {}
+                for prefix_context in prefix_contexts:
+                    prefcon = self.context_prefixes([prefix_context])
+                    for pref, value in prefcon.items():
+                        if pref in context_prefixes and context_prefixes[pref] != value:
+                            context_prefixes[pref] = None
+                        else:
+                            context_prefixes[pref] = value
+            self.contexts[key] = dict((pref, value) for pref, value in
+                                      context_prefixes.items()
+                                      if value is not None)
+        return self.contexts[key]
+
+    def context_prefix_map(self, prefix_contexts):
+        """
+        Return the :class:`bald.terms.PrefixMap` of the prefixes of the
+        prefix_contexts, as for :meth:`context_prefixes`, built once per
+        sequence of contexts.
+
+        """
+        key = tuple(self._context_key(c) for c in prefix_contexts)
+        if key not in self.context_maps:
+            self.context_maps[key] = terms.PrefixMap(
+                self.context_prefixes(prefix_contexts))
+        return self.context_maps[key]
+
+    def _head(self, uri):
+        try:
+            response = self.session.head(uri, timeout=11, allow_redirects=True)
+        except Exception:
+            return None
+        return response.status_code
+
+    def check_uri(self, uri):
+        """
+        Return True if the uri resolves.
+
+        A HEAD request is tried first, unless a response is already
+        available without one; if it does not succeed, the result of a
+        full GET is used.
+
+        """
+        if not self.is_http_uri(uri):
+            raise ValueError('{} is not a HTTP URI.'.format(uri))
+        if uri not in self.checked:
+            local = (uri in self.cache or self.offline or
+                     (self.bundle is not None and uri in self.bundle) or
+                     (self.store is not None and uri in self.store))
+            result = False
+            if not local and self._head(uri) == 200:
+                result = True
+            elif self[uri].status_code == 200:
+                result = True
+            self.checked[uri] = result
+        return self.checked[uri]
+
+    def check_uris(self, uris):
+        """
+        Check each of the uris, concurrently.
+        Returns a dictionary of results keyed by uri; items which are not
+        HTTP URIs are left out.
+
+        """
+        pending = []
+        for uri in uris:
+            if self.is_http_uri(uri) and uri not in pending:
+                pending.append(uri)
+        if len(pending) > 1:
+            workers = min(self.max_workers, len(pending))
+            with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self.check_uri, pending))
+        else:
+            results = [self.check_uri(uri) for uri in pending]
+        return dict(zip(pending, results))
+
 
 class Resource(object):
     _rdftype = 'bald__Resource'
     # def __init__(self, baseuri, relative_id, attrs=None, prefixes=None,
     #              aliases=None, alias_graph=None):
     def __init__(self, baseuri, identity_pref, relative_id, attrs=None, prefixes=None,
-                 aliases=None, alias_graph=None, file_resource=False, file_locator=None):
+                 aliases=None, alias_graph=None, file_resource=False, file_locator=None,
+                 alias_index=None, resolver=None):
 
         """
         A resource of metadata statements.
 
         attrs: an dictionary of key value pair attributes
+        alias_index: a :class:`bald.terms.AliasIndex` of the alias_graph;
+            built on first use if None
+        resolver: a :class:`bald.terms.TermResolver`, shared by the
+            resources of a load; built on first use if None
         """
         self.baseuri = baseuri
         self.identity_pref = identity_pref
@@ -318,6 +925,8 @@ class Resource(object):
         if alias_graph is None:
             alias_graph = rdflib.Graph()
         self.alias_graph = alias_graph
+        self._alias_index = alias_index
+        self._resolver = resolver
 
     @property
     def identity(self):
@@ -340,7 +949,7 @@ class Resource(object):
         reserved_attrs = ['baseuri', 'identity_pref', 'relative_id', 'prefixes', '_prefixes',
                           '_prefix_suffix', '_http_uri_prefix', '_http_uri',
                           'aliases', 'alias_graph', 'attrs', '_rdftype', 'file_locator',
-                          'is_file']
+                          'is_file', '_alias_index', '_resolver']
         if attr in reserved_attrs:
             object.__setattr__(self, attr, value)
         else:
@@ -358,84 +967,49 @@ class Resource(object):
 
 
     def __getattr__(self, attr):
+        # special names, and attrs itself before it is set when unpickling
+        if attr == 'attrs' or (attr.startswith('__') and attr.endswith('__')):
+            raise AttributeError(attr)
         if attr not in self.attrs:
             msg = '{} object has no attribute {}'.format(type(self), attr)
             raise AttributeError(msg)
         return self.attrs[attr]
 
+    @property
+    def alias_index(self):
+        if self._alias_index is None:
+            if self._resolver is not None:
+                self._alias_index = self._resolver.alias_index
+            else:
+                self._alias_index = terms.AliasIndex(self.alias_graph)
+        return self._alias_index
+
+    @property
+    def resolver(self):
+        if self._resolver is None:
+            self._resolver = terms.TermResolver(self.baseuri, self._prefixes,
+                                                self.alias_index)
+        return self._resolver
+
+    @property
+    def prefix_map(self):
+        return self.resolver.prefix_map
+
     #@property
     def prefixes(self):
-        prefixes = {}
-        for key, value in self._prefixes.items():
-            if key.endswith('__') and self._http_uri_prefix.match(value):
-                pref = key.rstrip('__')
-                if pref in prefixes:
-                    raise ValueError('This container has conflicting prefix'
-                                     ' definitions.')
-                prefixes[pref] = value
-        return prefixes
+        """
+        Return the :class:`bald.terms.PrefixMap` of this resource's http
+        prefixes, keyed without the trailing '__'.
+
+        """
+        self.prefix_map.validate()
+        return self.prefix_map
 
     def unpack_predicate(self, astring):
-        result = astring
-        if isinstance(astring, six.string_types) and self._prefix_suffix.match(astring):
-            prefix, suffix = self._prefix_suffix.match(astring).groups()
-            if prefix in self.prefixes():
-                if self._http_uri.match(self.prefixes()[prefix]):
-                    result = astring.replace('{}__'.format(prefix),
-                                             self.prefixes()[prefix])
-        elif isinstance(astring, six.string_types):
-            qstr = ('prefix dct: <http://purl.org/dc/terms/> \n'
-                    'prefix owl: <http://www.w3.org/2002/07/owl#> \n'
-                    'select ?uri where \n'
-                    '{{?uri dct:identifier "{}" ; \n'
-                    '      rdf:type ?type. \n'
-                    'FILTER(?type in (rdf:Property, owl:ObjectProperty) ) \n'
-                    '}}\n')
-            predicate_alias_query = (six.text_type(qstr).format(astring))
-
-            qres = self.alias_graph.query(predicate_alias_query)
-            results = list(qres)
-            if len(results) > 1:
-                raise ValueError('multiple alias options')
-            elif len(results) == 1:
-                result = str(results[0][0])
-        if result == astring:
-            result = self.baseuri + result
-        return result
+        return self.resolver.unpack_predicate(astring)
 
     def unpack_rdfobject(self, astring, predicate):
-        result = astring
-        if isinstance(astring, six.string_types) and self._prefix_suffix.match(astring):
-            prefix, suffix = self._prefix_suffix.match(astring).groups()
-            if prefix in self.prefixes():
-                if self._http_uri.match(self.prefixes()[prefix]):
-                    result = astring.replace('{}__'.format(prefix),
-                                             self.prefixes()[prefix])
-        elif isinstance(astring, six.string_types):
-            # if not is_http_uri(predicate):
-            #     msg = 'predicate must be a http uri, not {}'.format(predicate)
-            #     raise ValueError(msg)
-            # can be a file uri too
-            qstr = ('prefix dct: <http://purl.org/dc/terms/> \n'
-                    'select ?uri where \n'
-                    '{{ <{pred}> rdfs:range ?range . \n'
-                    '?uri dct:identifier "{id}" ; \n'
-                    '     rdf:type ?range .\n'
-                    '}}\n')
-            rdfobj_alias_query = (six.text_type(qstr).format(pred=predicate, id=astring))
-            # qres = self.alias_graph.query(rdfobj_alias_query)
-            try:
-                qres = self.alias_graph.query(rdfobj_alias_query)
-                results = list(qres)
-                if len(results) > 1:
-                    raise ValueError('multiple alias options')
-                elif len(results) == 1:
-                    result = str(results[0][0])
-            except pyparsing.ParseException:
-                pass
-            except ValueError:
-                pass
-        return result
+        return self.resolver.unpack_rdfobject(astring, predicate)
 
     # def unpack_uri(self, astring):
     #     """
@@ -583,9 +1157,9 @@ class Resource(object):
             selfnode = rdflib.URIRef(self.identity)
             # if group, bind to namespace
             if self.identity.endswith('/'):
-                if not (rdflib.URIRef(self.identity) in
-                        [n[1] for n in graph.namespace_manager.namespaces()]):
-                    this = dict(graph.namespace_manager.namespaces())['this']
+                store = graph.namespace_manager.store
+                if store.prefix(rdflib.URIRef(self.identity)) is None:
+                    this = store.namespace('this')
                     nkey = self.identity.replace(this, 'this__')
                     nkey = nkey[:-1].replace('/', '__')
                     graph.bind(nkey, self.identity)
@@ -654,13 +1228,13 @@ class Resource(object):
         # should all identities of root groups include the trailing slash??
         ## all include trailing slash
         graph.bind('this', self.baseuri)# + '/')
-        for prefix_name in self.prefixes():
+        for prefix_name, prefix_uri in self.prefixes().items():
             
             #strip the double underscore suffix
 
             # new_name = prefix_name[:-2]
 
-            graph.bind(prefix_name, self.prefixes()[prefix_name])
+            graph.bind(prefix_name, prefix_uri)
 
         for alias_name in self.aliases:
             # hack :S
@@ -718,6 +1292,76 @@ class Array(Resource):
 class Container(Resource):
     _rdftype = 'bald__Container'
 
+    def resources(self):
+        """
+        Return the list of this Container and every Resource it contains
+        or refers to, directly or indirectly.
+
+        """
+        result = []
+        seen = set()
+        pending = [self]
+        while pending:
+            resource = pending.pop()
+            if id(resource) in seen:
+                continue
+            seen.add(id(resource))
+            result.append(resource)
+            for attr, objs in resource.attrs.items():
+                if isinstance(objs, (set, list)):
+                    pending.extend(obj for obj in objs
+                                   if isinstance(obj, Resource))
+                elif isinstance(objs, Resource):
+                    pending.append(objs)
+        return result
+
+    def resolve_terms(self):
+        """
+        Resolve every distinct attribute name and string value of the
+        Resources in this Container in one pass, each once.  The results
+        are remembered by the resolvers of the Resources, so that when the
+        graph, view and validation of the Container expand each term
+        through its Resource, the expansion is a lookup.
+
+        Returns a dictionary of name to predicate URI and a dictionary of
+        (value, predicate) to rdf object.
+
+        """
+        predicates = {}
+        rdfobjects = {}
+        for resource in self.resources():
+            resolver = resource.resolver
+            for attr, objs in resource.attrs.items():
+                if not isinstance(attr, six.string_types):
+                    continue
+                try:
+                    predicate = resolver.unpack_predicate(attr)
+                except ValueError:
+                    continue
+                predicates[attr] = predicate
+                if isinstance(objs, np.ndarray):
+                    objs = objs.tolist()
+                if not isinstance(objs, (set, list)):
+                    objs = [objs]
+                for obj in objs:
+                    if not isinstance(obj, six.string_types):
+                        continue
+                    keys = [(obj, predicate)]
+                    if attr == 'rdf__type':
+                        keys.append((obj, attr))
+                    for key in keys:
+                        if key not in rdfobjects:
+                            rdfobjects[key] = resolver.unpack_rdfobject(*key)
+        return predicates, rdfobjects
+
+    def rdfgraph(self):
+        self.resolve_terms()
+        return super(Container, self).rdfgraph()
+
+    def viewgraph(self):
+        self.resolve_terms()
+        return super(Container, self).viewgraph()
+
     def graph_elems(self):
         instances = []
         links = []
@@ -784,11 +1428,25 @@ def netcdf_shared_dimensions(source_var, target_var):
 
 
 @contextlib.contextmanager
-def load(afilepath):
+def load(afilepath, backend=None):
+    """
+    Open a file for reading, as a context manager.
+
+    Args:
+    * afilepath - the path to a .nc or .hdf file
+    * backend - 'cdf' reads classic format netCDF files with the header
+      parser of :mod:`bald.cdf`, without the netCDF C library; other
+      netCDF files are opened with netCDF4 as usual
+
+    """
     if afilepath.endswith('.hdf'):
         loader = h5py.File
     elif afilepath.endswith('.nc'):
         loader = netCDF4.Dataset
+        if backend == 'cdf' and cdf.is_classic(afilepath):
+            loader = cdf.Dataset
+        elif backend not in (None, 'cdf', 'netCDF4'):
+            raise ValueError('backend not supported: {}'.format(backend))
     else:
         raise ValueError('filepath suffix not supported: {}'.format(afilepath))
     #Disable this check for now to allow URL input
@@ -804,7 +1462,7 @@ def load(afilepath):
         except NameError:
             pass
 
-def _prefixes_and_aliases(fhandle, identity, alias_dict, prefix_contexts, cache):
+def _file_vocabularies(fhandle, alias_dict, prefix_contexts, cache):
     # prefixes are defined as group attributes in a dedicated group, and/or
     # by external resources
     prefix_var_name  = None
@@ -864,24 +1522,10 @@ def _prefixes_and_aliases(fhandle, identity, alias_dict, prefix_contexts, cache)
     #     prefixes['rdf__'] = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
 
     ## query keep above
-    context_prefixes = {}
-    for prefix_context in prefix_contexts:
-        if prefix_context.startswith('http://') or prefix_context.startswith('https://'):
-            prefcon = json.loads(cache[prefix_context].text)
-        else:
-            prefcon = json.loads(prefix_context)
-        if '@context' in prefcon:
-            for key in prefcon['@context']:
-                pref = '{}__'.format(key)
-                if pref in context_prefixes and context_prefixes[pref] != prefcon['@context'][key]:
-                    context_prefixes[pref] = None
-                else:
-                    context_prefixes[pref] = prefcon['@context'][key]
-    for akey in context_prefixes:
-        if context_prefixes[akey] is None:
-            context_prefixes.pop(akey)
-
-    precedence_update(prefixes, context_prefixes)
+    cache.prefetch(prefix_contexts)
+    # the file's own prefixes take precedence over the shared prefixes of
+    # the contexts, which are layered beneath them, not copied
+    prefixes = ChainMap(prefixes, cache.context_prefixes(prefix_contexts))
 
     # check that default set is handled, i.e. bald__ and rdf__
     if 'bald__' not in prefixes:
@@ -905,14 +1549,44 @@ def _prefixes_and_aliases(fhandle, identity, alias_dict, prefix_contexts, cache)
 
     aliases = careful_update(aliases, alias_dict)
 
-    aliasgraph = rdflib.Graph()
+    return prefixes, aliases, prefix_var_name
+
+
+def _prefixes_and_aliases(fhandle, identity, alias_dict, prefix_contexts, cache):
+    prefixes, aliases, prefix_var_name = _file_vocabularies(
+        fhandle, alias_dict, prefix_contexts, cache)
+
+    # all vocabularies this file needs, fetched concurrently up front
+    vocabularies = _vocabulary_uris(prefixes, aliases)
+    cache.prefetch(vocabularies)
+    versions = cache.versions(vocabularies)
+    # a state is only shared or kept if every vocabulary response is a 200
+    complete = all(version is not None for uri, version in versions)
+
+    # loads through this cache of files with the same versions of the same
+    # vocabularies share one interned, read-only state
+    if complete:
+        state = terms.vocabulary_registry.get(vocabularies, versions,
+                                              owner=cache.identity)
+        if state is not None:
+            return prefixes, aliases, state, prefix_var_name
+        if cache.snapshots is not None:
+            state = cache.snapshots.get(vocabularies, versions)
+            if state is not None:
+                state = terms.vocabulary_registry.intern(
+                    state, owner=cache.identity)
+                return prefixes, aliases, state, prefix_var_name
+
+    # the cached vocabulary graphs are overlaid, not copied
+    aliasgraph = terms.OverlayGraph()
 
     for alias in aliases:
-        response = cache[aliases[alias]]
-        try:
-            aliasgraph.parse(data=response.text, format='xml')
-        except Exception:
+        agraph = cache.graph(aliases[alias], formats=('xml',))
+        if agraph is None:
             print('Failed to parse: {}'.format(aliases[alias]))
+            complete = False
+        else:
+            aliasgraph.overlay(agraph)
         # try:
         #     import xml.sax._exceptions
         #     aliasgraph.parse(data=response.text, format='xml')
@@ -939,12 +1613,221 @@ def _prefixes_and_aliases(fhandle, identity, alias_dict, prefix_contexts, cache)
         #     raise ValueError('duplicate aliases')
         # aliases = careful_update(aliases, dict(new_aliases))
 
-    return prefixes, aliases, aliasgraph, prefix_var_name
+    # the prefix namespaces and the bald ontology are shared by every
+    # group, so are added to the alias graph once, here
+    for prefix in prefixes:
+        if prefixes[prefix].startswith('http'):
+            # print('parsing: {}'.format(prefixes[prefix][:-1]))
+            try:
+                agraph = cache.graph(prefixes[prefix][:-1],
+                                     formats=('xml', 'n3'))
+            except ValueError:
+                agraph = None
+            if agraph is None:
+                complete = False
+            else:
+                aliasgraph.overlay(agraph)
 
+    agraph = cache.graph(BALD_ONTOLOGY_URI, formats=('n3',))
+    if agraph is None:
+        complete = False
+    else:
+        aliasgraph.overlay(agraph)
 
-def _load_netcdf_group(fhandle, agroup, baseuri, identity_pref, gk, root_container, file_variables, prefixes, prefix_group_name, aliases, aliasgraph, cache):
-    file_variables = file_variables.copy()
-    
+    state = terms.VocabularyState(aliasgraph, vocabularies, versions)
+    # a vocabulary which failed may be there next time, so a state built
+    # without it is used by this file alone
+    if complete:
+        if cache.snapshots is not None:
+            cache.snapshots.set(vocabularies, versions, state)
+        state = terms.vocabulary_registry.intern(state, owner=cache.identity)
+
+    return prefixes, aliases, state, prefix_var_name
+
+
+def _vocabulary_uris(prefixes, aliases):
+    """
+    Return the list of vocabulary URIs which loading a file with these
+    prefixes and aliases will request from the cache.
+
+    """
+    uris = [aliases[alias] for alias in aliases]
+    for prefix in prefixes:
+        if prefixes[prefix].startswith('http'):
+            uris.append(prefixes[prefix][:-1])
+    uris.append(BALD_ONTOLOGY_URI)
+    return uris
+
+
+class _LazyAttrs(dict):
+    """
+    The attrs of a lazily loaded Container.  Its members are loaded from
+    the file when 'bald__contains' is first used, or when the attrs are
+    iterated, copied or pickled.
+
+    """
+    __slots__ = ('_load',)
+
+    def __init__(self, attrs, load):
+        super(_LazyAttrs, self).__init__(attrs)
+        self._load = load
+
+    def materialize(self):
+        load = self._load
+        if load is None:
+            return
+        # loading adds the members to these attrs, so is not itself lazy
+        self._load = None
+        attrs = dict.copy(self)
+        try:
+            load()
+        except Exception:
+            # leave the members to be loaded again, from the attrs as they were
+            dict.clear(self)
+            dict.update(self, attrs)
+            self._load = load
+            raise
+
+    def __missing__(self, key):
+        if key == 'bald__contains' and self._load is not None:
+            self.materialize()
+            return self[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key == 'bald__contains':
+            self.materialize()
+        return dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        if key == 'bald__contains':
+            self.materialize()
+        return dict.get(self, key, default)
+
+    def __iter__(self):
+        self.materialize()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self.materialize()
+        return dict.__len__(self)
+
+    def keys(self):
+        self.materialize()
+        return dict.keys(self)
+
+    def items(self):
+        self.materialize()
+        return dict.items(self)
+
+    def values(self):
+        self.materialize()
+        return dict.values(self)
+
+    def copy(self):
+        self.materialize()
+        return dict.copy(self)
+
+    def __reduce_ex__(self, protocol):
+        self.materialize()
+        return (dict, (dict.copy(self),))
+
+
+class _LazyFile(object):
+    """
+    An open file, kept open for as long as any Container loaded from it
+    lazily has members still to load.
+
+    """
+    def __init__(self, stack):
+        self.pending = 0
+        self._close = weakref.finalize(self, stack.close)
+
+    def defer(self, container, load):
+        """
+        Replace the attrs of the container with lazy attrs, which call
+        load to load its members.
+
+        """
+        def load_members():
+            load()
+            # a failed load keeps the file open, for the load to be retried
+            self.pending -= 1
+            if not self.pending:
+                self._close()
+        self.pending += 1
+        object.__setattr__(container, 'attrs',
+                           _LazyAttrs(container.attrs, load_members))
+
+
+class _VariableIndex(object):
+    """
+    The variables of a netCDF file, keyed by fully qualified path, and the
+    Resources loaded for them, built once for each load.
+
+    A name used in a group is resolved as netCDF resolves names: a plain
+    name is looked up in the group and then in each of its ancestors in
+    turn; a name with a '/' is a path, absolute or relative to the group,
+    which must be to a variable of the group or one of its ancestors.
+
+    """
+    def __init__(self, fhandle):
+        self.variables = {}
+        self.resources = {}
+        pending = [fhandle]
+        while pending:
+            group = pending.pop()
+            for name, variable in group.variables.items():
+                self.variables[self.path(group.path, name)] = variable
+            pending.extend(group.groups.values())
+
+    @staticmethod
+    def path(group_path, name):
+        if group_path.endswith('/'):
+            return group_path + name
+        return '{}/{}'.format(group_path, name)
+
+    @staticmethod
+    def scopes(group_path):
+        """
+        Return the group path and those of its ancestors, nearest first.
+
+        """
+        result = [group_path]
+        while group_path != '/':
+            group_path = group_path.rsplit('/', 1)[0] or '/'
+            result.append(group_path)
+        return result
+
+    def resolve(self, group_path, name):
+        """
+        Return the path of the loaded variable which name refers to in the
+        group, or None.
+
+        """
+        if '/' in name:
+            path = name
+            if not name.startswith('/'):
+                path = self.path(group_path, name)
+            parent = path.rsplit('/', 1)[0] or '/'
+            if path in self.resources and parent in self.scopes(group_path):
+                return path
+            return None
+        for scope in self.scopes(group_path):
+            path = self.path(scope, name)
+            if path in self.resources:
+                return path
+        return None
+
+    def resource(self, group_path, name):
+        return self.resources.get(self.resolve(group_path, name))
+
+    def variable(self, group_path, name):
+        return self.variables.get(self.resolve(group_path, name))
+
+
+def _load_netcdf_group(fhandle, agroup, baseuri, identity_pref, gk, root_container, variable_index, prefixes, prefix_group_name, aliases, aliasgraph, cache,
+                       resolver=None, lazy_file=None):
     gattrs = {}
     for k in agroup.ncattrs():
         gattrs[k] = getattr(agroup, k)
@@ -952,23 +1835,95 @@ def _load_netcdf_group(fhandle, agroup, baseuri, identity_pref, gk, root_contain
     gidentity = identity_pref + gk + '/'
 
     gcontainer = Container(baseuri, gidentity, '', gattrs, prefixes=prefixes,
-                           aliases=aliases, alias_graph=aliasgraph)
-
-    gcontainer.attrs['bald__contains'] = set()
+                           aliases=aliases, alias_graph=aliasgraph,
+                           resolver=resolver)
 
-    _load_netcdf_group_vars(fhandle, agroup, gcontainer, baseuri, gidentity, gattrs, file_variables, prefixes, prefix_group_name, aliases, aliasgraph, cache)
     if 'bald__contains' not in root_container.attrs:
         root_container.attrs['bald__contains'] = set()
     root_container.attrs['bald__contains'].add(gcontainer)
-    for gk in agroup.groups:
 
-        _load_netcdf_group(fhandle, agroup.groups[gk], baseuri, gidentity, gk, gcontainer, file_variables,
-                           prefixes, prefix_group_name, aliases, aliasgraph, cache)
+    members = functools.partial(_load_netcdf_members, fhandle, agroup, gcontainer, baseuri, gidentity, gattrs,
+                                variable_index, list(agroup.groups), prefixes, prefix_group_name, aliases,
+                                aliasgraph, cache, resolver, lazy_file)
+    if lazy_file is None:
+        members()
+    else:
+        lazy_file.defer(gcontainer, members)
+
+
+def _load_netcdf_members(fhandle, agroup, container, baseuri, identity_pref, attrs, variable_index, group_names,
+                         prefixes, prefix_group_name, aliases, aliasgraph, cache, resolver, lazy_file):
+    # the variables of agroup, with their references, and its groups
+    container.attrs['bald__contains'] = set()
+
+    _load_netcdf_group_vars(fhandle, agroup, container, baseuri, identity_pref, attrs, variable_index, prefixes,
+                            prefix_group_name, aliases, aliasgraph, cache, resolver)
+
+    for gk in group_names:
+        _load_netcdf_group(fhandle, agroup.groups[gk], baseuri, identity_pref, gk, container, variable_index,
+                           prefixes, prefix_group_name, aliases, aliasgraph, cache,
+                           resolver, lazy_file)
 
 
 
-def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_pref, attrs, file_variables, prefixes,
-                            prefix_var_name, aliases, aliasgraph, cache):
+# attributes which netCDF4 uses to mask or scale the values of a variable
+_MASK_SCALE_ATTRS = frozenset(['_FillValue', 'missing_value', 'valid_min',
+                               'valid_max', 'valid_range', 'scale_factor',
+                               'add_offset', '_Unsigned'])
+
+
+def _coordinate_endpoints(variable):
+    """
+    Return the first and last values of a 1-D variable, as indexing it with
+    0 and -1 would, read together in one strided request, so that each
+    chunk is read once.  The last value is None if the variable has only one.
+
+    Numeric netCDF4 variables without masking or scaling attributes are read
+    raw, and only compared with the default fill value.
+
+    """
+    size = len(variable)
+    window = slice(0, size, max(size - 1, 1))
+    attrs = variable.ncattrs()
+    scaled = (getattr(variable, 'scale', True) and
+              ('scale_factor' in attrs or 'add_offset' in attrs))
+    if (np.dtype(variable.dtype).kind in 'iuf' and
+        hasattr(variable, 'set_auto_maskandscale') and
+        not _MASK_SCALE_ATTRS.intersection(attrs)):
+        mask, scale = variable.mask, variable.scale
+        variable.set_auto_maskandscale(False)
+        try:
+            raw = np.asarray(variable[window])
+        finally:
+            variable.set_auto_mask(mask)
+            variable.set_auto_scale(scale)
+        fill = None
+        if mask and raw.dtype.itemsize > 1:
+            fill = netCDF4.default_fillvals.get('{}{}'.format(raw.dtype.kind,
+                                                              raw.dtype.itemsize))
+        values = np.ma.MaskedArray(raw, mask=(raw == fill) if fill is not None
+                                   else np.ma.nomask)
+    else:
+        values = variable[window]
+    endpoints = []
+    for index in range(len(values)):
+        if not isinstance(values, np.ma.MaskedArray):
+            # such as the strings of a variable length string variable
+            endpoints.append(values[index])
+        elif np.ma.getmaskarray(values)[index]:
+            endpoints.append(np.ma.masked)
+        elif scaled:
+            # netCDF4 returns a single scaled value as a numpy scalar
+            endpoints.append(values[index])
+        else:
+            endpoints.append(np.ma.MaskedArray(np.ma.getdata(values)[index]))
+    if len(endpoints) == 1:
+        endpoints.append(None)
+    return endpoints
+
+
+def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_pref, attrs, variable_index, prefixes,
+                            prefix_var_name, aliases, aliasgraph, cache, resolver=None):
 
     for name in agroup.variables:
         if name ==  prefix_var_name:
@@ -981,12 +1936,14 @@ def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_p
             identity = baseuri + name
 
         # netCDF coordinate variable special case
-        if (len(agroup.variables[name].dimensions) == 1 and
-            agroup.variables[name].dimensions[0] == name and
-            len(agroup.variables[name]) > 0):
-
-            if not isinstance(agroup.variables[name][0], np.ma.core.MaskedConstant):
-                sattrs['bald__arrayFirstValue'] = agroup.variables[name][0]
+        variable = agroup.variables[name]
+        if (len(variable.dimensions) == 1 and
+            variable.dimensions[0] == name and
+            len(variable) > 0):
+
+            first, last = _coordinate_endpoints(variable)
+            if not isinstance(first, np.ma.core.MaskedConstant):
+                sattrs['bald__arrayFirstValue'] = first
                 if isinstance(sattrs['bald__arrayFirstValue'], str):
                     pass
                     
@@ -994,9 +1951,9 @@ def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_p
                     sattrs['bald__arrayFirstValue'] = int(sattrs['bald__arrayFirstValue'])
                 elif np.issubdtype(sattrs['bald__arrayFirstValue'].dtype, np.floating):
                     sattrs['bald__arrayFirstValue'] = float(sattrs['bald__arrayFirstValue'])
-                if (len(agroup.variables[name]) > 1 and
-                    not isinstance(agroup.variables[name][-1], np.ma.core.MaskedConstant)):
-                    sattrs['bald__arrayLastValue'] = agroup.variables[name][-1]
+                if (last is not None and
+                    not isinstance(last, np.ma.core.MaskedConstant)):
+                    sattrs['bald__arrayLastValue'] = last
                     if isinstance(sattrs['bald__arrayLastValue'], str):
                         pass
                     elif np.issubdtype(sattrs['bald__arrayLastValue'].dtype, np.integer):
@@ -1005,8 +1962,8 @@ def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_p
                         sattrs['bald__arrayLastValue'] = float(sattrs['bald__arrayLastValue'])
 
             # datetime special case
-            if 'units' in agroup.variables[name].ncattrs():
-                ustr = agroup.variables[name].getncattr('units')
+            if 'units' in variable.ncattrs():
+                ustr = variable.getncattr('units')
                 pattern = '^([a-z]+) since ([0-9T:\\. -]+)'
 
                 amatch = re.match(pattern, ustr)
@@ -1017,37 +1974,35 @@ def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_p
                     tog = datetime.parse_datetime(origin,
                                                         calendar=ig)
                     if tog is not None:
-                        dtype = '{}{}'.format(agroup.variables[name].dtype.kind,
-                                              agroup.variables[name].dtype.itemsize)
+                        dtype = '{}{}'.format(variable.dtype.kind,
+                                              variable.dtype.itemsize)
                         fv = netCDF4.default_fillvals.get(dtype)
-                        first = None
-                        if agroup.variables[name][0] == fv:
-                            first = np.ma.MaskedArray(agroup.variables[name][0],
-                                                      mask=True)
+                        efirst = None
+                        if first == fv:
+                            efirst = np.ma.MaskedArray(first, mask=True)
                         else:
-                            first = agroup.variables[name][0]
-                        if first is not None:
+                            efirst = first
+                        if efirst is not None:
                             try:
-                                first = int(first)
+                                efirst = int(efirst)
                             except Exception:
                                 pass
-                            edate_first = datetime.EpochDateTimes(first,
+                            edate_first = datetime.EpochDateTimes(efirst,
                                                                   quantity,
                                                                   epoch=tog)
-                            if first is not np.ma.masked:
+                            if efirst is not np.ma.masked:
                                 sattrs['bald__arrayFirstValue'] = edate_first
-                        if len(agroup.variables[name]) > 1:
-                            if agroup.variables[name][0] == fv:
-                                last = np.ma.MaskedArray(agroup.variables[name][-1],
-                                                         mask=True)
+                        if last is not None:
+                            if first == fv:
+                                elast = np.ma.MaskedArray(last, mask=True)
                             else:
-                                last = agroup.variables[name][-1]
-                            if last:
+                                elast = last
+                            if elast:
                                 try:
-                                    last = round(last)
+                                    elast = round(elast)
                                 except Exception:
                                     pass
-                                edate_last = datetime.EpochDateTimes(last,
+                                edate_last = datetime.EpochDateTimes(elast,
                                                                      quantity,
                                                                      epoch=tog)
 
@@ -1060,103 +2015,44 @@ def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_p
         if agroup.variables[name].shape:
             sattrs['bald__shape'] = list(agroup.variables[name].shape)
             var = Array(baseuri, identity_pref, name, sattrs, prefixes=prefixes,
-                        aliases=aliases, alias_graph=aliasgraph)
+                        aliases=aliases, alias_graph=aliasgraph,
+                        resolver=resolver)
         else:
             var = Resource(baseuri, identity_pref, name, sattrs, prefixes=prefixes,
-                          aliases=aliases, alias_graph=aliasgraph)
+                          aliases=aliases, alias_graph=aliasgraph,
+                          resolver=resolver)
         root_container.attrs['bald__contains'].add(var)
 
-        file_variables[name] = var
-
-    for prefix in prefixes:
-        if prefixes[prefix].startswith('http'):
-            # print('parsing: {}'.format(prefixes[prefix][:-1]))
-            try:
-                aliasgraph.parse(data=cache[prefixes[prefix][:-1]].text, format='xml')
-                # print('parsed: {}'.format(prefixes[prefix][:-1]))
-            except Exception:
-                try:
-                    aliasgraph.parse(data=cache[prefixes[prefix][:-1]].text, format='n3')
-                    # print('parsed: {} (n3)'.format(prefixes[prefix][:-1]))
-                except Exception:
-                    pass
+        variable_index.resources[variable_index.path(agroup.path, name)] = var
 
-    reference_prefixes = dict()
-    # reference_graph = copy.copy(aliasgraph)
-    reference_graph = aliasgraph
-
-    response = cache['https://www.opengis.net/def/binary-array-ld']
-    reference_graph.parse(data=response.text, format='n3')
-    #reference_graph.parse(data=response.text, format='turtle')
-
-
-    # # reference_graph.parse('https://www.opengis.net/def/binary-array-ld')
-    # qstr = ('prefix bald: <https://www.opengis.net/def/binary-array-ld/> '
-    #         'prefix skos: <http://www.w3.org/2004/02/skos/core#> '
-    #         'select ?s '
-    #         'where { '
-    #         '  ?s rdfs:range ?type . '
-    #         'filter(?type != rdfs:Literal) '
-    #         'filter(?type != skos:Concept) '
-    #         '}')
-
-    # refs_ = reference_graph.query(qstr)
-
-    qstr = ('prefix bald: <https://www.opengis.net/def/binary-array-ld/> '
-            'prefix skos: <http://www.w3.org/2004/02/skos/core#> '
-            'prefix owl: <http://www.w3.org/2002/07/owl#> '
-            'select ?s '
-            'where { '
-            '  ?s rdfs:range ?type . '
-            '  ?type rdf:type ?rtype . '
-            'filter(?rtype = owl:Class) '
-            '}')
-
-    qstr = ('prefix bald: <https://www.opengis.net/def/binary-array-ld/> '
-            'prefix skos: <http://www.w3.org/2004/02/skos/core#> '
-            'prefix owl: <http://www.w3.org/2002/07/owl#> '
-            'select ?s '
-            'where { '
-            '  ?s rdfs:range ?type . '
-            'filter(?type in (rdfs:Literal, skos:Concept)) '
-            '}')
-
-    refs = reference_graph.query(qstr)
-
-    non_ref_prefs = [str(ref[0]) for ref in list(refs)]
-
-    qstr = ('prefix bald: <https://www.opengis.net/def/binary-array-ld/> '
-            'prefix skos: <http://www.w3.org/2004/02/skos/core#> '
-            'prefix owl: <http://www.w3.org/2002/07/owl#> '
-            'select ?s '
-            'where { '
-            '   {?s rdfs:range bald:Resource .} '
-            '  UNION '
-            '  {?s rdfs:range ?as . '
-            '  ?as rdfs:subClassOf bald:Resource .} '
-            '}')
-
-    refs = reference_graph.query(qstr)
-
-    ref_prefs = [str(ref[0]) for ref in list(refs)]
+    # the property classification of the alias graph is computed once per
+    # set of vocabularies, in the process wide registry
+    if resolver is None:
+        resolver = root_container.resolver
+    properties = resolver.properties
+    if properties is None:
+        properties = terms.PropertyClasses(aliasgraph)
+    ref_prefs = properties.references
 
     # cycle again and find references
+    group_path = agroup.path
     for name in agroup.variables:
 
         if name ==  prefix_var_name:
             continue
 
-        var = file_variables[name]
+        var = variable_index.resources[variable_index.path(group_path, name)]
         sattrs = agroup.variables[name].__dict__.copy()
+        dims = agroup.variables[name].dimensions
 
         # coordinate variables are bald__references too
         if 'bald__Reference' not in var.rdf__type:
-            for dim in agroup.variables[name].dimensions:
-                if file_variables.get(dim) and name != dim:
+            for dim in dims:
+                if variable_index.resolve(group_path, dim) and name != dim:
                     _make_ref_entities(var, fhandle, agroup, dim, name,
                                        baseuri, identity_pref, root_container,
-                                       file_variables, prefixes,
-                                       aliases, aliasgraph)
+                                       variable_index, prefixes,
+                                       aliases, aliasgraph, resolver)
         # import pdb; pdb.set_trace()
         # for sattr in sattrs:
         for sattr in (sattr for sattr in sattrs if
@@ -1165,39 +2061,50 @@ def _load_netcdf_group_vars(fhandle, agroup, root_container, baseuri, identity_p
 
                 if sattrs[sattr].startswith('(') and sattrs[sattr].endswith(')'):
                     potrefs_list = sattrs[sattr].lstrip('( ').rstrip(' )').split(' ')
-                    refs = np.array([file_variables.get(pref) is not None
-                                     for pref in potrefs_list])
-                    if np.all(refs):
-                        var.attrs[sattr] = [file_variables.get(pref)
-                                            for pref in potrefs_list]
+                    refs = [variable_index.resource(group_path, pref)
+                            for pref in potrefs_list]
+                    if all(ref is not None for ref in refs):
+                        var.attrs[sattr] = refs
                         for pref in potrefs_list:
                             _make_ref_entities(var, fhandle, agroup, 
                                                pref, name, baseuri, identity_pref,
                                                root_container,
-                                               file_variables, prefixes,
-                                               aliases, aliasgraph)
+                                               variable_index, prefixes,
+                                               aliases, aliasgraph, resolver)
 
                 else:
                     potrefs_set = sattrs[sattr].split(' ')
-                    refs = np.array([file_variables.get(pref) is not None
-                                     for pref in potrefs_set])
-                    if np.all(refs):
-                        var.attrs[sattr] = set([file_variables.get(pref)
-                                                for pref in potrefs_set])
+                    refs = [variable_index.resource(group_path, pref)
+                            for pref in potrefs_set]
+                    if all(ref is not None for ref in refs):
+                        var.attrs[sattr] = set(refs)
+                        dim_paths = set(variable_index.resolve(group_path, dim)
+                                        for dim in dims)
                         for pref in potrefs_set:
                             # coordinate variables already handled
-                            if pref not in agroup.variables[name].dimensions:
+                            if variable_index.resolve(group_path, pref) not in dim_paths:
                                 _make_ref_entities(var, fhandle, agroup, 
                                                    pref, name, baseuri, identity_pref,
                                                    root_container,
-                                                   file_variables, prefixes,
-                                                   aliases, aliasgraph)
+                                                   variable_index, prefixes,
+                                                   aliases, aliasgraph, resolver)
 
 
-def load_netcdf(afilepath, baseuri=None, alias_dict=None, prefix_contexts=None, cache=None, file_locator=None):
+def load_netcdf(afilepath, baseuri=None, alias_dict=None, prefix_contexts=None, cache=None, file_locator=None,
+                backend=None, lazy=False):
     """
     Load a file with respect to binary-array-linked-data.
     Returns a :class:`bald.Collection`
+
+    The backend is passed to :func:`load`; backend='cdf' reads the
+    metadata of classic format files without the netCDF C library.
+
+    If lazy is True, the attributes of the root group are loaded at once,
+    but the members of each Container, its 'bald__contains', are only
+    loaded from the file when they are first used.  The file is kept open
+    until every member is loaded, or the Containers are no longer used.
+    Serializing the Container, as by rdfgraph, viewgraph or pickle, loads
+    everything.
     """
 
     if alias_dict is None:
@@ -1209,7 +2116,9 @@ def load_netcdf(afilepath, baseuri=None, alias_dict=None, prefix_contexts=None,
     if cache is None:
         cache = HttpCache()
 
-    with load(afilepath) as fhandle:
+    stack = contextlib.ExitStack()
+    with stack:
+        fhandle = stack.enter_context(load(afilepath, backend=backend))
 
         # ensure that baseuri always terminates in a '/'
         if baseuri is None:
@@ -1219,8 +2128,15 @@ def load_netcdf(afilepath, baseuri=None, alias_dict=None, prefix_contexts=None,
 
         identity = baseuri
 
-        prefixes, aliases, aliasgraph, prefix_group_name = _prefixes_and_aliases(fhandle, identity, alias_dict,
-                                                                                 prefix_contexts, cache)
+        prefixes, aliases, state, prefix_group_name = _prefixes_and_aliases(fhandle, identity, alias_dict,
+                                                                            prefix_contexts, cache)
+        aliasgraph = state.graph
+        # compiled once, and shared by every resource of this file
+        prefix_map = terms.PrefixMap(
+            prefixes.maps[0], base=cache.context_prefix_map(prefix_contexts))
+        resolver = terms.TermResolver(baseuri, prefix_map,
+                                      state.alias_index,
+                                      properties=state.properties)
 
         attrs = {}
         for k in fhandle.ncattrs():
@@ -1228,61 +2144,42 @@ def load_netcdf(afilepath, baseuri=None, alias_dict=None, prefix_contexts=None,
 
         root_container = Container(baseuri, baseuri, '', attrs, prefixes=prefixes,
                                    aliases=aliases, alias_graph=aliasgraph,
-                                   file_resource=True, file_locator=file_locator)
-
-        root_container.attrs['bald__contains'] = set()
-        
-        file_variables = {}
-        _load_netcdf_group_vars(fhandle, fhandle, root_container, baseuri, baseuri, attrs, file_variables, prefixes,
-                                prefix_group_name, aliases, aliasgraph, cache)
-
-        for gk in fhandle.groups:
-            if gk == prefix_group_name:
-                continue
-
-            _load_netcdf_group(fhandle, fhandle.groups[gk], baseuri, identity, gk, root_container, file_variables,
-                               prefixes, prefix_group_name, aliases, aliasgraph, cache)
+                                   file_resource=True, file_locator=file_locator,
+                                   resolver=resolver)
+
+        # the interned vocabulary state is in use for as long as the
+        # container is
+        weakref.finalize(root_container, terms.vocabulary_registry.release,
+                         state)
+
+        group_names = [gk for gk in fhandle.groups if gk != prefix_group_name]
+        # every variable of the file, for resolving references by name
+        variable_index = _VariableIndex(fhandle)
+        members = functools.partial(_load_netcdf_members, fhandle, fhandle, root_container, baseuri, identity,
+                                    attrs, variable_index, group_names, prefixes, prefix_group_name, aliases, aliasgraph,
+                                    cache, resolver)
+        if lazy:
+            # the file is closed by the lazy file, not on leaving the stack
+            lazy_file = _LazyFile(stack.pop_all())
+            lazy_file.defer(root_container, functools.partial(members, lazy_file))
+        else:
+            members(None)
     # _create_references(root_container,
     #                    prefixes, prefix_group_name, aliases, aliasgraph, cache)
 
     return root_container
 
-def _make_ref_entities(var, fhandle, variables, pref, name, baseuri, identity_pref,
-                       root_container, file_variables,
-                       prefixes, aliases, aliasgraph):
-    namevar = None
-    prefvar = None
-    try:
-        prefvar = variables[pref]
-    except IndexError:
-        try:
-            if not pref.startswith('/'):
-                ppref = '/' + pref
-            prefvar = fhandle[ppref]
-        except IndexError:
-            pass
-    try:
-        namevar = variables[name]
-    except IndexError:
-        try:
-            if not name.startswith('/'):
-                nname = '/' + name
-            namevar = fhandle[nname]
-        except IndexError:
-            pass
+def _make_ref_entities(var, fhandle, agroup, pref, name, baseuri, identity_pref,
+                       root_container, variable_index,
+                       prefixes, aliases, aliasgraph, resolver=None):
+    namevar = agroup.variables[name]
+    prefvar = variable_index.variable(agroup.path, pref)
+    if prefvar is None:
+        return
 
-    # if pref in variables:
-    #     prefvar = variables[pref]
-    # elif pref in fhandle:
-    #     prefvar = fhandle[pref]
-    # if name in variables:
-    #     namevar = variables[name]
-    # elif name in fhandle:
-    #     namevar = fhandle[name]
     shapematch = (namevar.shape == prefvar.shape)
 
-    if (namevar is not None and prefvar is not None and namevar.shape and not shapematch and
-        prefvar.shape):
+    if namevar.shape and not shapematch and prefvar.shape:
         try:
             refset = var.attrs.get('bald__references', set())
             if not isinstance(refset, set):
@@ -1299,11 +2196,12 @@ def _make_ref_entities(var, fhandle, variables, pref, name, baseuri, identity_pr
             targetReshape = [i[1] for i in reshapes['targetReshape'].items()]
             if targetReshape != list(prefvar.shape):
                 rattrs['bald__targetReshape'] = targetReshape
-            rattrs['bald__target'] = set((file_variables.get(pref),))
+            rattrs['bald__target'] = set((variable_index.resource(agroup.path, pref),))
             ref_node = Reference(baseuri, identity_pref, identity, rattrs,
                                prefixes=prefixes,
                                aliases=aliases,
-                               alias_graph=aliasgraph)
+                               alias_graph=aliasgraph,
+                               resolver=resolver)
 
             refset.add(ref_node)
             var.attrs['bald__references'] = refset
@@ -1316,12 +2214,264 @@ def _make_ref_entities(var, fhandle, variables, pref, name, baseuri, identity_pr
         # except IndexError:
         #     pass
 
+LoadResult = namedtuple('LoadResult', ['path', 'result', 'error'])
+LoadResult.__doc__ = """
+The outcome of loading one file in a batch: the path, the result (a
+Container, or the serialized graph) and the error traceback, which is
+None if the load succeeded.
+
+"""
+
+# the cache of a load worker process, shared by every file it loads, and
+# the queue on which it reports each file as it starts loading it
+_worker_cache = None
+_worker_started = None
+
+
+def _expand_paths(afilepaths):
+    if isinstance(afilepaths, six.string_types):
+        afilepaths = [afilepaths]
+    paths = OrderedDict()
+    for apath in afilepaths:
+        if any(char in apath for char in '*?['):
+            for match in sorted(glob.glob(apath, recursive=True)):
+                paths[match] = None
+        else:
+            paths[apath] = None
+    return list(paths)
+
+
+def _init_load_worker(cache, started):
+    global _worker_cache, _worker_started
+    _worker_cache = cache
+    _worker_started = started
+    # the vocabulary states compiled for one file are kept for the next
+    terms.vocabulary_registry.hold()
+
+
+def _load_one(apath, baseuri, alias_dict, prefix_contexts, output, backend,
+              cache):
+    try:
+        if callable(baseuri):
+            baseuri = baseuri(apath)
+        root_container = load_netcdf(apath, baseuri=baseuri,
+                                     alias_dict=alias_dict,
+                                     prefix_contexts=prefix_contexts,
+                                     cache=cache, backend=backend)
+        result = root_container
+        if output is not None:
+            result = root_container.rdfgraph().serialize(format=output)
+        return LoadResult(apath, result, None)
+    except Exception:
+        return LoadResult(apath, None, traceback.format_exc())
+
+
+def _load_in_worker(apath, *args):
+    _worker_started.put(apath)
+    result = _load_one(apath, *args, cache=_worker_cache)
+    if isinstance(result.result, Container):
+        # the resources of a load only need the alias index of the
+        # vocabulary graph, so the graph, which is large, is not sent back
+        empty = rdflib.Graph()
+        for resource in result.result.resources():
+            resource._alias_index = resource.alias_index
+            resource.alias_graph = empty
+    return result
+
+
+def _drain(started):
+    result = []
+    while not started.empty():
+        result.append(started.get())
+    return result
+
+
+def _pool_load(paths, args, cache, processes):
+    """
+    Load the paths with a pool of worker processes, yielding a
+    :class:`LoadResult` for each one as it completes.
+
+    If a worker dies, the pool breaks, and one new pool loads the files
+    which had not finished: first those which had been started, one at a
+    time, so that a file which kills its worker again is known and
+    reported as failed, then the others together.
+
+    """
+    started = multiprocessing.SimpleQueue()
+    finished = set()
+    suspects = []
+    remaining = list(paths)
+    while remaining or suspects:
+        broken = False
+        with futures.ProcessPoolExecutor(max_workers=processes,
+                                         initializer=_init_load_worker,
+                                         initargs=(cache, started)) as pool:
+            while suspects and not broken:
+                apath = suspects.pop(0)
+                try:
+                    result = pool.submit(_load_in_worker, apath, *args).result()
+                except futures.process.BrokenProcessPool:
+                    broken = True
+                    result = LoadResult(apath, None, traceback.format_exc())
+                except Exception:
+                    result = LoadResult(apath, None, traceback.format_exc())
+                _drain(started)
+                finished.add(apath)
+                yield result
+            if broken:
+                continue
+            pending = dict((pool.submit(_load_in_worker, apath, *args), apath)
+                           for apath in remaining)
+            running = set()
+            try:
+                for future in futures.as_completed(pending):
+                    running.update(_drain(started))
+                    try:
+                        result = future.result()
+                    except futures.process.BrokenProcessPool:
+                        broken = True
+                        continue
+                    except Exception:
+                        # such as a failure to send the file's result back
+                        result = LoadResult(pending[future], None,
+                                            traceback.format_exc())
+                    finished.add(pending[future])
+                    yield result
+            finally:
+                # if iteration stops early, do not wait for the remaining
+                # files
+                for future in pending:
+                    future.cancel()
+                running.update(_drain(started))
+        remaining = [apath for apath in remaining if apath not in finished]
+        if broken:
+            suspects = [apath for apath in remaining if apath in running]
+            if not suspects:
+                # the pool broke before any file was started
+                for apath in remaining:
+                    yield LoadResult(apath, None, 'BrokenProcessPool: a '
+                                     'worker process died before loading')
+                return
+            remaining = [apath for apath in remaining
+                         if apath not in suspects]
+
+
+def iter_load(afilepaths, baseuri=None, alias_dict=None, prefix_contexts=None,
+              cache=None, processes=None, output=None, backend=None):
+    """
+    Load netCDF files, yielding a :class:`LoadResult` for each one as it
+    completes.  An error loading one file is reported in its result, and
+    does not stop the others.
+
+    Args:
+
+        * afilepaths - a path or glob pattern, or a list of them
+        * baseuri - the base URI for every file, or a callable returning
+                    the base URI for a path; by default each file's own
+                    file:// URI
+        * alias_dict, prefix_contexts, backend - as for :func:`load_netcdf`
+        * cache - the :class:`HttpCache` to load with; each worker process
+                  gets a copy, sharing its stored responses, bundle and
+                  snapshots.  By default, the workers share their
+                  responses through a temporary
+                  :class:`bald.cachestore.SqliteCache`
+        * processes - the number of worker processes, by default the number
+                      of CPUs; if 0, files are loaded in this process
+        * output - None, to yield Containers, or an rdflib serialization
+                   format, such as 'turtle', to yield each file's graph
+                   serialized in that format; serializing in the workers
+                   avoids sending Containers between processes.  Containers
+                   from worker processes come without their alias graph,
+                   keeping only its alias index.
+
+    """
+    return _iter_paths(_expand_paths(afilepaths), baseuri, alias_dict,
+                       prefix_contexts, cache, processes, output, backend)
+
+
+def _iter_paths(paths, baseuri, alias_dict, prefix_contexts, cache, processes,
+                output, backend):
+    # iter_load of paths which are already expanded
+    args = (baseuri, alias_dict, prefix_contexts, output, backend)
+    if processes == 0:
+        if cache is None:
+            cache = HttpCache()
+        terms.vocabulary_registry.hold()
+        try:
+            for apath in paths:
+                yield _load_one(apath, *args, cache=cache)
+        finally:
+            terms.vocabulary_registry.unhold()
+        return
+    if processes is None:
+        processes = os.cpu_count() or 1
+    directory = None
+    if cache is None:
+        directory = tempfile.mkdtemp()
+        cache = HttpCache(store=cachestore.SqliteCache(
+            os.path.join(directory, 'cache.sqlite')))
+    try:
+        for result in _pool_load(paths, args, cache, processes):
+            yield result
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_many(afilepaths, baseuri=None, alias_dict=None, prefix_contexts=None,
+              cache=None, processes=None, output=None, backend=None):
+    """
+    Load netCDF files with a pool of worker processes.
+    Returns a list of :class:`LoadResult`, in the order of the paths.
+
+    The arguments are as for :func:`iter_load`.
+
+    """
+    paths = _expand_paths(afilepaths)
+    results = dict((result.path, result) for result in
+                   _iter_paths(paths, baseuri, alias_dict, prefix_contexts,
+                               cache, processes, output, backend))
+    return [results[apath] for apath in paths]
+
+
+def build_vocabulary_bundle(afilepaths, bundle_path, alias_dict=None,
+                            prefix_contexts=None, cache=None):
+    """
+    Load each of the netCDF files, and write every vocabulary which they
+    use to a vocabulary bundle at bundle_path, for use by an offline
+    :class:`bald.HttpCache`.
+    Returns the list of bundled URIs.
+
+    """
+    if alias_dict is None:
+        alias_dict = {}
+    if isinstance(prefix_contexts, str):
+        prefix_contexts = [prefix_contexts]
+    elif prefix_contexts is None:
+        prefix_contexts = []
+    if cache is None:
+        cache = HttpCache()
+    # the vocabularies are fetched directly, as an interned vocabulary
+    # state would leave them out of this cache
+    for afilepath in afilepaths:
+        with load(afilepath) as fhandle:
+            prefixes, aliases, _ = _file_vocabularies(
+                fhandle, alias_dict, prefix_contexts, cache)
+        cache.prefetch(_vocabulary_uris(prefixes, aliases))
+    responses = dict((uri, response) for uri, response in cache.cache.items()
+                     if response.status_code == 200)
+    cachestore.write_bundle(bundle_path, responses)
+    return sorted(responses)
+
+
 def validate_netcdf(afilepath, baseuri=None, cache=None, uris_resolve=False):
     """
     Validate a file with respect to binary-array-linked-data.
     Returns a :class:`bald.validation.Validation`
 
     """
+    if cache is None:
+        cache = HttpCache()
     root_container = load_netcdf(afilepath, baseuri=baseuri, cache=cache)
     return validate(root_container, cache=cache, uris_resolve=uris_resolve)
 
@@ -1332,33 +2482,60 @@ def validate_hdf5(afilepath, baseuri=None, cache=None, uris_resolve=False):
     Returns a :class:`bald.validation.Validation`
 
     """
+    if cache is None:
+        cache = HttpCache()
     root_container = load_hdf5(afilepath, baseuri=baseuri, cache=cache)
     return validate(root_container, cache=cache, uris_resolve=uris_resolve)
 
+def _resource_validations(root_container, cache, uris_resolve):
+    """
+    Yield a validation for the container and, recursively, for each of
+    the resources it contains.
+
+    """
+    yield bv.ContainerValidation(resource=root_container, httpcache=cache,
+                                 uris_resolve=uris_resolve)
+    for resource in root_container.attrs.get('bald__contains', set()):
+        if isinstance(resource, Array):
+            yield bv.ArrayValidation(resource, httpcache=cache,
+                                     uris_resolve=uris_resolve)
+        elif isinstance(resource, Container):
+            for validation in _resource_validations(resource, cache,
+                                                    uris_resolve):
+                yield validation
+        elif isinstance(resource, Resource):
+            yield bv.ResourceValidation(resource, httpcache=cache,
+                                        uris_resolve=uris_resolve)
+
+
 def validate(root_container, sval=None, cache=None, uris_resolve=False):
     """
     Validate a Container with respect to binary-array-linked-data.
     Returns a :class:`bald.validation.Validation`
 
+    If uris_resolve is True, every URI used in the Container is checked
+    once, all concurrently, before the results are reported per resource.
+
     """
     if sval is None:
         sval = bv.StoredValidation()
-
-    root_val = bv.ContainerValidation(resource=root_container, httpcache=cache,
-                                      uris_resolve=uris_resolve)
-    sval.stored_exceptions += root_val.exceptions()
-    for resource in root_container.attrs.get('bald__contains', set()):
-        if isinstance(resource, Array):
-            array_val = bv.ArrayValidation(resource, httpcache=cache,
-                                           uris_resolve=uris_resolve)
-            sval.stored_exceptions += array_val.exceptions()
-        elif isinstance(resource, Container):
-            sval = validate(resource, sval=sval, cache=cache,
-                            uris_resolve=uris_resolve)
-        elif isinstance(resource, Resource):
-            resource_val = bv.ResourceValidation(resource, httpcache=cache,
-                                               uris_resolve=uris_resolve)
-            sval.stored_exceptions += resource_val.exceptions()
+    if cache is None:
+        cache = HttpCache()
+    if isinstance(root_container, Container):
+        root_container.resolve_terms()
+
+    validations = list(_resource_validations(root_container, cache,
+                                             uris_resolve))
+    if uris_resolve:
+        uris = []
+        for validation in validations:
+            validation.attr_uris = validation.find_attr_uris()
+            uris += validation.attr_uris
+        uri_results = cache.check_uris(uris)
+        for validation in validations:
+            validation.uri_results = uri_results
+    for validation in validations:
+        sval.stored_exceptions += validation.exceptions()
 
     return sval
 
@@ -1420,8 +2597,11 @@ def _hdf_group(fhandle, identity='root', baseuri=None, prefixes=None,
         aliases = careful_update(aliases, dict(fhandle[alias_group].attrs))
     attrs = dict(fhandle.attrs)
     aliasgraph = rdflib.Graph()
+    resolver = terms.TermResolver(baseuri, terms.PrefixMap(prefixes),
+                                  terms.AliasIndex(aliasgraph))
     root_container = Container(baseuri, baseuri, identity, attrs, prefixes=prefixes,
-                               aliases=aliases, alias_graph=aliasgraph)
+                               aliases=aliases, alias_graph=aliasgraph,
+                               resolver=resolver)
 
     root_container.attrs['bald__contains'] = set()
 
@@ -1440,7 +2620,8 @@ def _hdf_group(fhandle, identity='root', baseuri=None, prefixes=None,
             elif isinstance(dataset, h5py._hl.dataset.Dataset):
                 sattrs = dict(dataset.attrs)
                 sattrs['bald__shape'] = list(dataset.shape)
-                dset = Array(baseuri, baseuri, name, sattrs, prefixes, aliases, aliasgraph)
+                dset = Array(baseuri, baseuri, name, sattrs, prefixes, aliases, aliasgraph,
+                             resolver=resolver)
                 root_container.attrs['bald__contains'].add(dset)
                 file_variables[dataset.name] = dset
     return root_container, file_variables
@@ -0,0 +1,654 @@
+"""
+Persistent storage tiers for :class:`bald.HttpCache`.
+
+A store provides get, entry, set, refresh, get_failure, set_failure,
+claim, release and wait_for, keyed by URI.
+
+A :class:`SnapshotStore` keeps compiled vocabulary state, keyed by the set
+of vocabulary URIs it was built from.
+
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+
+import requests
+
+
+def response_record(uri, response):
+    """
+    Return a (header, body) pair describing a requests.Response, suitable
+    for storage.
+
+    """
+    header = {'uri': uri,
+              'url': response.url,
+              'status_code': response.status_code,
+              'reason': response.reason,
+              'encoding': response.encoding,
+              'headers': dict(response.headers),
+              'stored': time.time()}
+    body = response.content
+    if body is None:
+        body = b''
+    return header, body
+
+
+def record_response(header, body):
+    """
+    Rebuild a requests.Response from a stored (header, body) pair.
+
+    """
+    response = requests.models.Response()
+    response.url = header.get('url')
+    response.status_code = header.get('status_code')
+    response.reason = header.get('reason')
+    response.encoding = header.get('encoding')
+    response.headers = requests.structures.CaseInsensitiveDict(
+        header.get('headers', {}))
+    response._content = body
+    return response
+
+
+def encode_record(header, body):
+    """
+    Return the bytes storing a (header, body) pair.
+
+    """
+    return json.dumps(header).encode('utf-8') + b'\n' + body
+
+
+def decode_record(data):
+    """
+    Return the (header, body) pair stored in the given bytes.
+
+    """
+    line, _, body = data.partition(b'\n')
+    return json.loads(line.decode('utf-8')), body
+
+
+def _uri_key(uri):
+    return hashlib.sha256(uri.encode('utf-8')).hexdigest()
+
+
+def _is_fresh(header, ttl):
+    if 'failure' in header:
+        return False
+    return ttl is None or time.time() - header.get('stored', 0) <= ttl
+
+
+def _failure_record(uri, failure, header, body):
+    # add the failure to a stored response record, or make a new record
+    if header is None or 'status_code' not in header:
+        header, body = {'uri': uri, 'stored': time.time()}, b''
+    header['failure'] = failure
+    return header, body
+
+
+class DiskCache(object):
+    """
+    A directory of cached HTTP responses, which may be shared by
+    concurrent processes.
+
+    Each URI is stored as one entry file, replaced atomically on write.
+    An entry holds a response, a record of failed attempts to fetch one,
+    or both, when a stored response could not be revalidated.  Responses
+    older than `ttl` seconds are treated as missing; if `max_size` (bytes)
+    is given, the least recently used entries are evicted to keep the
+    directory within that size.
+
+    """
+    suffix = '.entry'
+
+    def __init__(self, directory, ttl=None, max_size=None):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, uri):
+        return os.path.join(self.directory, _uri_key(uri) + self.suffix)
+
+    def _read(self, uri):
+        path = self._path(uri)
+        try:
+            with open(path, 'rb') as fin:
+                header, body = decode_record(fin.read())
+        except (IOError, OSError, ValueError):
+            return None, None
+        # guard against hash collisions
+        if header.get('uri') != uri:
+            return None, None
+        return header, body
+
+    def _write(self, header, body):
+        path = self._path(header['uri'])
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                fout.write(encode_record(header, body))
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _is_fresh(self, header):
+        return _is_fresh(header, self.ttl)
+
+    def _touch(self, uri):
+        # the entry modification time records recency of use
+        try:
+            os.utime(self._path(uri), None)
+        except OSError:
+            pass
+
+    def get(self, uri):
+        """
+        Return the stored response for the uri, or None if there is no
+        fresh entry.
+
+        """
+        response, fresh = self.entry(uri)
+        if not fresh:
+            response = None
+        return response
+
+    def entry(self, uri):
+        """
+        Return a (response, fresh) pair for the uri, where the response
+        may be stale, or (None, False) if no response is stored.
+
+        """
+        header, body = self._read(uri)
+        if header is None or 'status_code' not in header:
+            return None, False
+        self._touch(uri)
+        return record_response(header, body), self._is_fresh(header)
+
+    def refresh(self, uri, headers=None):
+        """
+        Mark the stored response for the uri as fresh, as after a
+        successful revalidation, updating its stored headers from those
+        given.
+
+        """
+        header, body = self._read(uri)
+        if header is None or 'status_code' not in header:
+            return
+        header.pop('failure', None)
+        if headers:
+            header['headers'].update(dict(headers))
+        header['stored'] = time.time()
+        self._write(header, body)
+
+    def set(self, uri, response):
+        """
+        Store the response for the uri.
+
+        """
+        header, body = response_record(uri, response)
+        self._write(header, body)
+        self.evict()
+
+    def get_failure(self, uri):
+        """
+        Return the failure record stored for the uri, or None.
+
+        """
+        header, _ = self._read(uri)
+        if header is None:
+            return None
+        return header.get('failure')
+
+    def set_failure(self, uri, failure):
+        """
+        Store a failure record for the uri.  A stored response is kept, but
+        is stale until it is refreshed or replaced.
+
+        """
+        self._write(*_failure_record(uri, failure, *self._read(uri)))
+        self.evict()
+
+    def claim(self, uri):
+        """
+        Claim the right to fetch the uri.  Processes sharing a directory
+        do not coordinate fetches, so this always succeeds.
+
+        """
+        return True
+
+    def release(self, uri):
+        pass
+
+    def wait_for(self, uri):
+        return self.get(uri)
+
+    def delete(self, uri):
+        try:
+            os.remove(self._path(uri))
+        except OSError:
+            pass
+
+    def __contains__(self, uri):
+        header, _ = self._read(uri)
+        return header is not None and self._is_fresh(header)
+
+    def _entries(self):
+        entries = []
+        for fname in os.listdir(self.directory):
+            if not fname.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, fname)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by a concurrent process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        """
+        Return the total size, in bytes, of the stored entries.
+
+        """
+        return sum(entry[1] for entry in self._entries())
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache is within
+        max_size.
+
+        """
+        if self.max_size is None:
+            return
+        entries = self._entries()
+        total = sum(entry[1] for entry in entries)
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SqliteCache(object):
+    """
+    A SQLite database of cached HTTP responses, which may be shared by
+    concurrent processes on one host.
+
+    The database runs in WAL mode, so readers do not block on the writer.
+    Before fetching a URI, a process claims it; other processes wait for
+    the claimant to store the response rather than fetching it too.
+    Responses older than `ttl` seconds are stale; if `max_size` (bytes) is
+    given, the least recently used entries are evicted to keep the stored
+    bodies within that size.
+
+    """
+    def __init__(self, path, ttl=None, max_size=None, lease=90,
+                 poll_interval=0.1):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS entries '
+                     '(uri TEXT PRIMARY KEY, header TEXT, body BLOB, '
+                     'size INTEGER, accessed REAL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS fills '
+                     '(uri TEXT PRIMARY KEY, expires REAL)')
+
+    def __getstate__(self):
+        # connections belong to one process and thread
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=60,
+                                   isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _read(self, uri):
+        row = self._connection().execute(
+            'SELECT header, body FROM entries WHERE uri = ?',
+            (uri,)).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), bytes(row[1])
+
+    def _write(self, header, body):
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                     (header['uri'], json.dumps(header), sqlite3.Binary(body),
+                      len(body), time.time()))
+        self.evict()
+
+    def get(self, uri):
+        """
+        Return the stored response for the uri, or None if there is no
+        fresh entry.
+
+        """
+        response, fresh = self.entry(uri)
+        if not fresh:
+            response = None
+        return response
+
+    def entry(self, uri):
+        """
+        Return a (response, fresh) pair for the uri, where the response
+        may be stale, or (None, False) if no response is stored.
+
+        """
+        header, body = self._read(uri)
+        if header is None or 'status_code' not in header:
+            return None, False
+        self._connection().execute(
+            'UPDATE entries SET accessed = ? WHERE uri = ?', (time.time(), uri))
+        return record_response(header, body), _is_fresh(header, self.ttl)
+
+    def set(self, uri, response):
+        """
+        Store the response for the uri.
+
+        """
+        header, body = response_record(uri, response)
+        self._write(header, body)
+
+    def refresh(self, uri, headers=None):
+        """
+        Mark the stored response for the uri as fresh, as after a
+        successful revalidation, updating its stored headers from those
+        given.
+
+        """
+        header, body = self._read(uri)
+        if header is None or 'status_code' not in header:
+            return
+        header.pop('failure', None)
+        if headers:
+            header['headers'].update(dict(headers))
+        header['stored'] = time.time()
+        self._write(header, body)
+
+    def get_failure(self, uri):
+        """
+        Return the failure record stored for the uri, or None.
+
+        """
+        header, _ = self._read(uri)
+        if header is None:
+            return None
+        return header.get('failure')
+
+    def set_failure(self, uri, failure):
+        """
+        Store a failure record for the uri.  A stored response is kept, but
+        is stale until it is refreshed or replaced.
+
+        """
+        self._write(*_failure_record(uri, failure, *self._read(uri)))
+
+    def claim(self, uri):
+        """
+        Claim the right to fetch the uri, returning False if another
+        process holds an unexpired claim on it.
+
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT expires FROM fills WHERE uri = ?',
+                               (uri,)).fetchone()
+            claimed = row is None or row[0] < now
+            if claimed:
+                conn.execute('INSERT OR REPLACE INTO fills VALUES (?, ?)',
+                             (uri, now + self.lease))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return claimed
+
+    def release(self, uri):
+        self._connection().execute('DELETE FROM fills WHERE uri = ?', (uri,))
+
+    def wait_for(self, uri):
+        """
+        Wait while another process holds a claim on the uri, then return
+        its stored response, or None.
+
+        """
+        conn = self._connection()
+        while True:
+            row = conn.execute('SELECT expires FROM fills WHERE uri = ?',
+                               (uri,)).fetchone()
+            if row is None or row[0] < time.time():
+                break
+            time.sleep(self.poll_interval)
+        response, _ = self.entry(uri)
+        return response
+
+    def delete(self, uri):
+        self._connection().execute('DELETE FROM entries WHERE uri = ?', (uri,))
+
+    def __contains__(self, uri):
+        header, _ = self._read(uri)
+        return header is not None and _is_fresh(header, self.ttl)
+
+    def size(self):
+        """
+        Return the total size, in bytes, of the stored bodies.
+
+        """
+        row = self._connection().execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return row[0]
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache is within
+        max_size.
+
+        """
+        if self.max_size is None:
+            return
+        conn = self._connection()
+        total = self.size()
+        if total <= self.max_size:
+            return
+        rows = conn.execute('SELECT uri, size FROM entries '
+                            'ORDER BY accessed').fetchall()
+        for uri, size in rows:
+            if total <= self.max_size:
+                break
+            conn.execute('DELETE FROM entries WHERE uri = ?', (uri,))
+            total -= size
+
+    def clear(self):
+        self._connection().execute('DELETE FROM entries')
+
+
+class VocabularyBundle(object):
+    """
+    A read-only set of pre-fetched responses, keyed by URI, held in a
+    directory or a zip archive.
+
+    A bundle contains an 'index.json' file, mapping each URI to the name of
+    the member file which stores its response.
+
+    """
+    index_name = 'index.json'
+
+    def __init__(self, path):
+        self.path = path
+        self._archive = None
+        if zipfile.is_zipfile(path):
+            self._archive = zipfile.ZipFile(path)
+        elif not os.path.isdir(path):
+            raise ValueError('{} is not a vocabulary bundle directory or '
+                             'zip archive.'.format(path))
+        self.index = json.loads(self._member(self.index_name).decode('utf-8'))
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def _member(self, name):
+        if self._archive is not None:
+            return self._archive.read(name)
+        with open(os.path.join(self.path, name), 'rb') as fin:
+            return fin.read()
+
+    def uris(self):
+        return sorted(self.index)
+
+    def __contains__(self, uri):
+        return uri in self.index
+
+    def get(self, uri):
+        """
+        Return the bundled response for the uri, or None.
+
+        """
+        if uri not in self.index:
+            return None
+        header, body = decode_record(self._member(self.index[uri]))
+        return record_response(header, body)
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+
+
+def write_bundle(path, responses):
+    """
+    Write a vocabulary bundle to path, from a dictionary of responses keyed
+    by URI.  The bundle is a zip archive if the path ends with '.zip', and
+    a directory otherwise.
+
+    """
+    index = {}
+    members = {}
+    for uri, response in responses.items():
+        name = _uri_key(uri) + DiskCache.suffix
+        header, body = response_record(uri, response)
+        index[uri] = name
+        members[name] = encode_record(header, body)
+    members[VocabularyBundle.index_name] = json.dumps(
+        index, indent=1, sort_keys=True).encode('utf-8')
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in sorted(members):
+                archive.writestr(name, members[name])
+    else:
+        os.makedirs(path, exist_ok=True)
+        for name in sorted(members):
+            with open(os.path.join(path, name), 'wb') as fout:
+                fout.write(members[name])
+
+
+class SnapshotStore(object):
+    """
+    A directory of pickled snapshots of compiled vocabulary state, each
+    keyed by the set of vocabulary URIs it was built from, and valid only
+    for the versions of their responses it was built from.
+
+    Snapshots older than `ttl` seconds are treated as missing.  Snapshots
+    are unpickled when read, so the directory must only be writable by
+    trusted users.
+
+    """
+    suffix = '.snapshot'
+
+    def __init__(self, directory, ttl=None):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, uris):
+        return os.path.join(self.directory,
+                            _uri_key('\n'.join(uris)) + self.suffix)
+
+    def get(self, uris, versions):
+        """
+        Return the state stored for this set of uris, or None if there is
+        none for these versions of their responses.
+
+        """
+        uris = sorted(set(uris))
+        try:
+            with open(self._path(uris), 'rb') as fin:
+                record = pickle.load(fin)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError):
+            return None
+        if (record.get('uris') != uris or
+                record.get('versions') != tuple(versions) or
+                not _is_fresh(record, self.ttl)):
+            return None
+        return record['state']
+
+    def set(self, uris, versions, state):
+        """
+        Store the state built from these versions of the responses for this
+        set of uris, replacing any snapshot of the same set.
+
+        """
+        uris = sorted(set(uris))
+        record = {'uris': uris, 'versions': tuple(versions),
+                  'stored': time.time(), 'state': state}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                pickle.dump(record, fout, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(uris))
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
@@ -0,0 +1,380 @@
+"""
+The bald cdf module reads the metadata of netCDF classic format files, CDF-1
+ (classic), CDF-2 (64-bit offset) and CDF-5 (64-bit data), without the netCDF
+ C library.
+
+The file is memory mapped and only its header is decoded.  Attributes are
+ copied out of the header, in native byte order; variable data is read
+ through numpy views of the mapped file, so is not copied until it is
+ used.  The :class:`Dataset` offers the parts of the
+ netCDF4.Dataset interface which bald uses: groups, dimensions, variables,
+ attributes, and indexing of variable data with netCDF4's default masking
+ and scaling.
+
+"""
+from collections import OrderedDict
+import mmap
+import struct
+
+import netCDF4
+import numpy as np
+
+MAGIC = b'CDF'
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+# netCDF type code: big endian numpy dtype
+NC_TYPES = {1: np.dtype('>i1'), 2: np.dtype('S1'), 3: np.dtype('>i2'),
+            4: np.dtype('>i4'), 5: np.dtype('>f4'), 6: np.dtype('>f8'),
+            7: np.dtype('>u1'), 8: np.dtype('>u2'), 9: np.dtype('>u4'),
+            10: np.dtype('>i8'), 11: np.dtype('>u8')}
+
+STREAMING = 0xFFFFFFFF
+
+
+def is_classic(afilepath):
+    """
+    Return True if the file at afilepath is a netCDF classic format file.
+
+    """
+    try:
+        with open(afilepath, 'rb') as fin:
+            head = fin.read(4)
+    except (IOError, OSError):
+        return False
+    return head[:3] == MAGIC and head[3:4] in (b'\x01', b'\x02', b'\x05')
+
+
+class _Header(object):
+    # a cursor over the header bytes of a mapped file
+    def __init__(self, buf, version):
+        self.buf = buf
+        self.pos = 4
+        self.version = version
+
+    def _unpack(self, fmt):
+        value, = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def int32(self):
+        return self._unpack('>i')
+
+    def uint32(self):
+        return self._unpack('>I')
+
+    def int64(self):
+        return self._unpack('>q')
+
+    def non_neg(self):
+        # counts and lengths are 64 bit in CDF-5
+        if self.version == 5:
+            return self.int64()
+        return self.int32()
+
+    def offset(self):
+        if self.version == 1:
+            return self.int32()
+        return self.int64()
+
+    def padded(self, nbytes):
+        start = self.pos
+        self.pos += nbytes + (-nbytes % 4)
+        return start
+
+    def name(self):
+        nchars = self.non_neg()
+        start = self.padded(nchars)
+        return bytes(self.buf[start:start + nchars]).decode('utf-8')
+
+    def values(self):
+        nc_type = self.int32()
+        nelems = self.non_neg()
+        dtype = NC_TYPES[nc_type]
+        start = self.padded(nelems * dtype.itemsize)
+        if nc_type == 2:
+            text = bytes(self.buf[start:start + nelems])
+            return text.decode('utf-8', 'replace').replace('\x00', '')
+        # a copy, so that nothing refers to the mapping once it is closed
+        values = np.frombuffer(self.buf, dtype=dtype, count=nelems,
+                               offset=start).astype(dtype.newbyteorder('='))
+        if nelems == 1:
+            return values[0]
+        return values
+
+    def list_header(self, tag):
+        found = self.int32()
+        nelems = self.non_neg()
+        if found == 0 and nelems == 0:
+            return 0
+        if found != tag:
+            raise ValueError('Malformed netCDF header at byte {}.'.format(self.pos))
+        return nelems
+
+    def attributes(self):
+        attrs = OrderedDict()
+        for _ in range(self.list_header(NC_ATTRIBUTE)):
+            name = self.name()
+            attrs[name] = self.values()
+        return attrs
+
+
+class Variable(object):
+    """
+    A variable of a classic format file.  Its attributes are its instance
+    attributes, as for netCDF4.Variable.
+
+    """
+    __slots__ = ('__dict__', '_name', '_dataset', '_dimensions', '_dtype',
+                 '_begin', '_record')
+
+    def __init__(self, dataset, name, dimensions, attrs, dtype, begin, record):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_dataset', dataset)
+        object.__setattr__(self, '_dimensions', dimensions)
+        object.__setattr__(self, '_dtype', dtype)
+        object.__setattr__(self, '_begin', begin)
+        object.__setattr__(self, '_record', record)
+        self.__dict__.update(attrs)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('bald.cdf files are read only')
+
+    def __repr__(self):
+        return '<bald.cdf.Variable {} {}>'.format(self._name, self.shape)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def dimensions(self):
+        return self._dimensions
+
+    @property
+    def dtype(self):
+        return self._dtype.newbyteorder('=') if self._dtype.kind != 'S' else self._dtype
+
+    @property
+    def shape(self):
+        dims = self._dataset.dimensions
+        return tuple(len(dims[dim]) for dim in self._dimensions)
+
+    @property
+    def ndim(self):
+        return len(self._dimensions)
+
+    def __len__(self):
+        if not self._dimensions:
+            raise TypeError('len() of unsized object')
+        return self.shape[0]
+
+    def ncattrs(self):
+        return list(self.__dict__)
+
+    def getncattr(self, name):
+        return self.__dict__[name]
+
+    def _data(self):
+        # a view of the variable's data in the mapped file
+        shape = self.shape
+        buf = self._dataset._buf
+        if not self._record:
+            return np.ndarray(shape, dtype=self._dtype, buffer=buf,
+                              offset=self._begin)
+        inner = np.ndarray(shape[1:], dtype=self._dtype).strides
+        strides = (self._dataset._recsize,) + inner
+        return np.ndarray(shape, dtype=self._dtype, buffer=buf,
+                          offset=self._begin, strides=strides)
+
+    def _masked(self, data):
+        # netCDF4's default masking and scaling
+        attrs = self.__dict__
+        mask = np.zeros(data.shape, dtype=bool)
+        if self._dtype.kind != 'S':
+            if '_FillValue' in attrs:
+                fill = np.array(attrs['_FillValue'], dtype=self._dtype)
+                if fill.dtype.kind == 'f' and np.isnan(fill).any():
+                    mask |= np.isnan(data)
+                else:
+                    mask |= np.isin(data, fill)
+            elif self._dtype.itemsize > 1:
+                fill = netCDF4.default_fillvals.get(
+                    '{}{}'.format(self._dtype.kind, self._dtype.itemsize))
+                if fill is not None:
+                    mask |= data == np.array(fill, dtype=self._dtype)
+            if 'missing_value' in attrs:
+                mask |= np.isin(data, np.array(attrs['missing_value'],
+                                               dtype=self._dtype))
+            valid_min = attrs.get('valid_min')
+            valid_max = attrs.get('valid_max')
+            if 'valid_range' in attrs:
+                valid_min, valid_max = attrs['valid_range'][:2]
+            if valid_min is not None:
+                mask |= data < valid_min
+            if valid_max is not None:
+                mask |= data > valid_max
+        data = data.astype(self.dtype)
+        if 'scale_factor' in attrs:
+            data = data * attrs['scale_factor']
+        if 'add_offset' in attrs:
+            data = data + attrs['add_offset']
+        if not mask.any():
+            mask = np.ma.nomask
+        return np.ma.MaskedArray(data, mask=mask)
+
+    def __getitem__(self, key):
+        data = self._data()[key]
+        result = self._masked(np.asarray(data))
+        if result.ndim == 0:
+            if result.mask:
+                return np.ma.masked
+            if 'scale_factor' in self.__dict__ or 'add_offset' in self.__dict__:
+                # as netCDF4 returns a single scaled value
+                return result.data[()]
+        return result
+
+
+class Dataset(object):
+    """
+    A read only, metadata first view of a netCDF classic format file.  Its
+    global attributes are its instance attributes, as for netCDF4.Dataset.
+
+    """
+    __slots__ = ('__dict__', 'filepath', 'data_model', 'dimensions',
+                 'variables', 'groups', 'path', 'name', '_file', '_buf',
+                 '_numrecs', '_recsize')
+
+    def __init__(self, afilepath, mode='r'):
+        if mode != 'r':
+            raise ValueError('bald.cdf files are read only')
+        _set = object.__setattr__
+        _set(self, 'filepath', afilepath)
+        _set(self, 'path', '/')
+        _set(self, 'name', '/')
+        _set(self, 'groups', OrderedDict())
+        _set(self, '_file', open(afilepath, 'rb'))
+        try:
+            buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file cannot be mapped
+            self._file.close()
+            raise ValueError('{} is not a netCDF classic format '
+                             'file.'.format(afilepath))
+        _set(self, '_buf', buf)
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):
+        _set = object.__setattr__
+        buf = self._buf
+        if buf[:3] != MAGIC or buf[3] not in (1, 2, 5):
+            raise ValueError('{} is not a netCDF classic format '
+                             'file.'.format(self.filepath))
+        version = buf[3]
+        _set(self, 'data_model', {1: 'NETCDF3_CLASSIC',
+                                  2: 'NETCDF3_64BIT_OFFSET',
+                                  5: 'NETCDF3_64BIT_DATA'}[version])
+        header = _Header(buf, version)
+        if version == 5:
+            numrecs = header.int64()
+        else:
+            numrecs = header.uint32()
+
+        dims = []
+        for _ in range(header.list_header(NC_DIMENSION)):
+            name = header.name()
+            dims.append(_Dimension(self, name, header.non_neg()))
+        _set(self, 'dimensions', OrderedDict((dim.name, dim) for dim in dims))
+        self.__dict__.update(header.attributes())
+
+        record_vars = []
+        variables = OrderedDict()
+        for _ in range(header.list_header(NC_VARIABLE)):
+            name = header.name()
+            dimids = [header.non_neg() for _ in range(header.non_neg())]
+            attrs = header.attributes()
+            dtype = NC_TYPES[header.int32()]
+            vsize = header.non_neg() if version == 5 else header.uint32()
+            begin = header.offset()
+            vdims = tuple(dims[i].name for i in dimids)
+            record = bool(dimids) and dims[dimids[0]].isunlimited()
+            var = Variable(self, name, vdims, attrs, dtype, begin, record)
+            if record:
+                record_vars.append((var, vsize))
+            variables[name] = var
+        _set(self, 'variables', variables)
+
+        if len(record_vars) == 1:
+            # a single record variable's records are not padded
+            var = record_vars[0][0]
+            recsize = var._dtype.itemsize * int(np.prod(var.shape[1:], dtype=np.int64))
+        else:
+            recsize = sum(vsize for var, vsize in record_vars)
+        _set(self, '_recsize', recsize)
+        # a streaming file, whose record count is all ones, has as many
+        # records as fit in the file
+        if numrecs == STREAMING or numrecs < 0:
+            numrecs = 0
+            if record_vars and recsize:
+                begin = min(var._begin for var, vsize in record_vars)
+                numrecs = (len(buf) - begin) // recsize
+        _set(self, '_numrecs', numrecs)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('bald.cdf files are read only')
+
+    def __repr__(self):
+        return '<bald.cdf.Dataset {}>'.format(self.filepath)
+
+    def __getitem__(self, name):
+        if name.startswith('/'):
+            name = name[1:]
+        if name in self.variables:
+            return self.variables[name]
+        raise IndexError('{} not found in /'.format(name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def ncattrs(self):
+        return list(self.__dict__)
+
+    def getncattr(self, name):
+        return self.__dict__[name]
+
+    def close(self):
+        try:
+            self._buf.close()
+        finally:
+            self._file.close()
+
+
+class _Dimension(object):
+    def __init__(self, dataset, name, size):
+        self._dataset = dataset
+        self.name = name
+        self._size = size
+
+    def isunlimited(self):
+        return self._size == 0
+
+    @property
+    def size(self):
+        if self.isunlimited():
+            return self._dataset._numrecs
+        return self._size
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return '<bald.cdf.Dimension {} {}>'.format(self.name, self.size)
@@ -0,0 +1,633 @@
+"""
+The bald terms module supplies the lookup structures used to expand the
+ attribute names and values of a file into URIs.
+
+The alias graph of a load is compiled once into dictionary indexes, so that
+ each term is found by a dictionary lookup rather than by a SPARQL query.
+
+A :class:`TermResolver` is created once per load and shared by all of its
+ resources, so that each distinct attribute name or value is expanded once.
+
+Expanding a 'pref__name' term splits it on '__' and looks the prefix up in
+ the load's :class:`PrefixMap`, so it does not depend on the number of
+ prefixes.
+
+"""
+from collections import ChainMap, OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import re
+import threading
+
+import rdflib
+import rdflib.graph
+import rdflib.namespace
+import six
+
+BALD = rdflib.namespace.Namespace('https://www.opengis.net/def/binary-array-ld/')
+DCT = rdflib.namespace.Namespace('http://purl.org/dc/terms/')
+PROPERTY_TYPES = (rdflib.namespace.RDF.Property,
+                  rdflib.namespace.OWL.ObjectProperty)
+
+_prefix_suffix = re.compile('(^(?:(?!__).)*)__((?!.*__).*$)')
+_http_uri = re.compile('http[s]?://.*')
+_http_uri_prefix = re.compile('http[s]?://.*/|#')
+
+
+class PrefixMap(Mapping):
+    __slots__ = ('_prefixes', '_keys', '_conflicts', '_hash')
+
+    def __init__(self, prefixes, base=None):
+        """
+        A read only mapping of prefix to namespace URI, of the http prefix
+        definitions, keyed 'pref__', in prefixes.  It is built once per load
+        and is hashable, so it may key other caches.
+
+        Args:
+        * prefixes - a dictionary of prefix definitions, keyed 'pref__'
+        * base - a PrefixMap, such as that of a cached prefix context,
+                 whose definitions apply where prefixes has no definition
+                 of the same key; it is layered beneath, not copied
+
+        """
+        amap = {}
+        # prefix: the (key, namespace) definitions of it, in order
+        keys = {}
+        for key, value in prefixes.items():
+            if key.endswith('__') and _http_uri_prefix.match(value):
+                pref = key.rstrip('__')
+                amap[pref] = value
+                keys[pref] = keys.get(pref, ()) + ((key, value),)
+        conflicts = set(pref for pref, defs in keys.items() if len(defs) > 1)
+        if base is not None:
+            # only the prefixes which prefixes defines, or whose base
+            # definitions it hides by defining the same key, differ from
+            # the base
+            changed = set(keys)
+            for key in prefixes:
+                if key.rstrip('__') in base._keys:
+                    changed.add(key.rstrip('__'))
+            hidden = set()
+            for pref in changed:
+                defs = keys.get(pref, ()) + tuple(
+                    (key, value) for key, value in base._keys.get(pref, ())
+                    if key not in prefixes)
+                if defs:
+                    amap[pref] = defs[-1][1]
+                    keys[pref] = defs
+                elif pref in base._keys:
+                    hidden.add(pref)
+                if len(defs) > 1:
+                    conflicts.add(pref)
+            conflicts.update(base._conflicts - changed)
+            below = base._prefixes
+            below_keys = base._keys
+            if hidden:
+                below = dict((pref, value) for pref, value in base.items()
+                             if pref not in hidden)
+                below_keys = dict((pref, defs) for pref, defs in
+                                  base._keys.items() if pref not in hidden)
+            amap = ChainMap(amap, below)
+            keys = ChainMap(keys, below_keys)
+        self._build(amap, keys, frozenset(conflicts))
+
+    def _build(self, amap, keys, conflicts):
+        object.__setattr__(self, '_prefixes', amap)
+        object.__setattr__(self, '_keys', keys)
+        object.__setattr__(self, '_conflicts', conflicts)
+        object.__setattr__(self, '_hash', None)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('PrefixMap is read only')
+
+    def __reduce__(self):
+        return (_unpickle_prefix_map, (self._prefixes, self._keys,
+                                       self._conflicts))
+
+    def __getitem__(self, prefix):
+        return self._prefixes[prefix]
+
+    def __iter__(self):
+        return iter(self._prefixes)
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def __hash__(self):
+        # computed on first use, as a layered map is not otherwise walked
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash((frozenset(self.items()),
+                                                    bool(self._conflicts))))
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, PrefixMap):
+            return (bool(self._conflicts) == bool(other._conflicts) and
+                    dict(self.items()) == dict(other.items()))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __repr__(self):
+        return 'PrefixMap({})'.format(dict(self.items()))
+
+    def validate(self):
+        """
+        Raise ValueError if the prefix definitions conflict.
+
+        """
+        if self._conflicts:
+            raise ValueError('This container has conflicting prefix'
+                             ' definitions.')
+
+
+def _unpickle_prefix_map(prefixes, keys, conflicts):
+    result = PrefixMap.__new__(PrefixMap)
+    result._build(prefixes, keys, conflicts)
+    return result
+
+
+class AliasIndex(object):
+    def __init__(self, graph):
+        """
+        Dictionary indexes of the identified terms in an alias graph.
+
+        Args:
+        * graph - the rdflib.Graph of alias vocabularies; it is read once,
+                  so later changes to the graph are not seen by the index.
+
+        """
+        # identifier: [property uri], one entry per matching property type
+        self.predicates = {}
+        # (type, identifier): [uri]
+        self.objects = {}
+        # predicate uri: [range]
+        self.ranges = {}
+        for subject, identifier in graph.subject_objects(DCT.identifier):
+            if not (isinstance(identifier, rdflib.Literal) and
+                    identifier.datatype is None and
+                    identifier.language is None):
+                continue
+            identifier = str(identifier)
+            for rdftype in graph.objects(subject, rdflib.namespace.RDF.type):
+                if rdftype in PROPERTY_TYPES:
+                    self.predicates.setdefault(identifier, []).append(subject)
+                akey = (rdftype, identifier)
+                self.objects.setdefault(akey, []).append(subject)
+        for subject, arange in graph.subject_objects(rdflib.namespace.RDFS.range):
+            if isinstance(subject, rdflib.URIRef):
+                self.ranges.setdefault(str(subject), []).append(arange)
+
+    def predicate(self, identifier):
+        """
+        Return the property URI with this identifier, or None if there is
+        none.  Raises ValueError if more than one property matches.
+
+        """
+        results = self.predicates.get(identifier, [])
+        if len(results) > 1:
+            raise ValueError('multiple alias options')
+        elif len(results) == 1:
+            return str(results[0])
+        return None
+
+    def rdfobject(self, identifier, predicate):
+        """
+        Return the URI with this identifier whose type is a range of the
+        predicate, or None if there is none.  Raises ValueError if more than
+        one matches.
+
+        """
+        results = []
+        for arange in self.ranges.get(predicate, []):
+            results.extend(self.objects.get((arange, identifier), []))
+        if len(results) > 1:
+            raise ValueError('multiple alias options')
+        elif len(results) == 1:
+            return str(results[0])
+        return None
+
+
+class PropertyClasses(object):
+    def __init__(self, graph):
+        """
+        The classification of the properties in an ontology graph, by
+        whether they take literal values or refer to other resources.
+
+        Args:
+        * graph - the rdflib.Graph of the ontology and alias vocabularies
+
+        """
+        literal_types = (rdflib.namespace.RDFS.Literal,
+                         rdflib.namespace.SKOS.Concept)
+        resource_types = set([BALD.Resource])
+        resource_types.update(graph.subjects(rdflib.namespace.RDFS.subClassOf,
+                                             BALD.Resource))
+        literals = set()
+        references = set()
+        for subject, arange in graph.subject_objects(rdflib.namespace.RDFS.range):
+            if arange in literal_types:
+                literals.add(str(subject))
+            if arange in resource_types:
+                references.add(str(subject))
+        self.literals = frozenset(literals)
+        self.references = frozenset(references)
+
+
+class PropertyRegistry(object):
+    def __init__(self):
+        """
+        A process wide registry of :class:`PropertyClasses`, so that each
+        version of an ontology is classified once.
+
+        """
+        self._classes = {}
+        self._lock = threading.Lock()
+
+    def classes(self, key, graph):
+        """
+        Return the :class:`PropertyClasses` of the graph, computing them
+        only if the key has not been seen before.
+
+        Args:
+        * key - a hashable identity of the graph's content
+        * graph - the rdflib.Graph to classify
+
+        """
+        with self._lock:
+            result = self._classes.get(key)
+        if result is None:
+            result = PropertyClasses(graph)
+            with self._lock:
+                result = self._classes.setdefault(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._classes.clear()
+
+
+property_registry = PropertyRegistry()
+
+
+class OverlayGraph(rdflib.graph.ReadOnlyGraphAggregate):
+    """
+    A graph of shared, read-only base graphs, such as the vocabulary graphs
+    of a :class:`bald.HttpCache`, with a small delta graph of its own.
+
+    Queries see the union of the bases and the delta, each triple once.
+    Additions go to the delta, so the bases are never copied or changed.
+    Once frozen, the overlay refuses all changes.
+
+    """
+    def __init__(self, bases=None):
+        self.delta = rdflib.Graph()
+        self.frozen = False
+        super(OverlayGraph, self).__init__([self.delta])
+        for base in bases or []:
+            self.overlay(base)
+
+    def __repr__(self):
+        return '<OverlayGraph: {} bases>'.format(len(self.graphs) - 1)
+
+    def __reduce__(self):
+        # pickled as a single base, with the delta merged into it
+        flat = rdflib.Graph()
+        for triple in self.triples((None, None, None)):
+            flat.add(triple)
+        return (_unpickle_overlay, (flat, self.frozen))
+
+    def overlay(self, base):
+        """
+        Add a read-only base graph beneath the delta.
+
+        """
+        if self.frozen:
+            raise rdflib.graph.ModificationException()
+        if not any(base is graph for graph in self.graphs):
+            self.graphs.insert(len(self.graphs) - 1, base)
+
+    def freeze(self):
+        self.frozen = True
+
+    def add(self, triple):
+        if self.frozen:
+            raise rdflib.graph.ModificationException()
+        self.delta.add(triple)
+        return self
+
+    def addN(self, quads):
+        for s, p, o, c in quads:
+            self.add((s, p, o))
+        return self
+
+    def remove(self, triple):
+        raise rdflib.graph.ModificationException()
+
+    def __iadd__(self, other):
+        for triple in other:
+            self.add(triple)
+        return self
+
+    def triples(self, triple):
+        if len(self.graphs) == 1:
+            for atriple in self.graphs[0].triples(triple):
+                yield atriple
+            return
+        for i, graph in enumerate(self.graphs):
+            earlier = self.graphs[:i]
+            for atriple in graph.triples(triple):
+                if not any(atriple in other for other in earlier):
+                    yield atriple
+
+    def __len__(self):
+        return sum(1 for _ in self.triples((None, None, None)))
+
+
+def _unpickle_overlay(base, frozen):
+    result = OverlayGraph([base])
+    result.frozen = frozen
+    return result
+
+
+class VocabularyState(object):
+    def __init__(self, graph, uris, version=None):
+        """
+        The compiled vocabulary state of a load: the merged alias graph,
+        with its alias index and property classification.
+
+        Args:
+        * graph - the rdflib.Graph of the alias and prefix vocabularies
+        * uris - the vocabulary URIs the graph was built from
+        * version - a hashable identity of the content of the responses the
+                    graph was built from, such as
+                    :meth:`bald.HttpCache.versions`; the property
+                    classification is only shared between states of the
+                    same version, and is not shared if there is none
+
+        """
+        self.uris = tuple(sorted(set(uris)))
+        self.version = version
+        # set when the state is interned by a VocabularyRegistry
+        self.registry_key = None
+        self.graph = graph
+        self.alias_index = AliasIndex(graph)
+        if version is None:
+            self.properties = PropertyClasses(graph)
+        else:
+            self.properties = property_registry.classes(version, graph)
+
+
+class VocabularyRegistry(object):
+    def __init__(self):
+        """
+        A process wide registry of interned :class:`VocabularyState`, so
+        that loads of files with the same versions of the same vocabulary
+        URIs, through the same cache, share one read-only copy of it.  Each
+        state is counted in by :meth:`intern` or :meth:`get` and out by
+        :meth:`release`, and is dropped when its count reaches zero.
+
+        """
+        self._states = {}
+        self._counts = {}
+        self._holds = 0
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._states)
+
+    def hold(self):
+        """
+        Keep every state used from now on interned until a matching
+        :meth:`unhold`, even while no load is using it, such as between
+        the files of a batch.
+
+        """
+        with self._lock:
+            self._holds += 1
+
+    def unhold(self):
+        with self._lock:
+            self._holds -= 1
+            if self._holds > 0:
+                return
+            held, self._held = self._held, {}
+        for state in held.values():
+            self.release(state)
+
+    def _count_in(self, key):
+        # with the lock held
+        self._counts[key] += 1
+        if self._holds and key not in self._held:
+            self._counts[key] += 1
+            self._held[key] = self._states[key]
+
+    @staticmethod
+    def _key(uris, versions, owner):
+        if versions is not None:
+            versions = tuple(versions)
+        return (owner, tuple(sorted(set(uris))), versions)
+
+    def get(self, uris, versions=None, owner=None):
+        """
+        Return the interned state for this set of uris, counting it in, or
+        None if there is none.
+
+        Args:
+        * uris - the vocabulary URIs
+        * versions - the versions of their responses, as for
+                     :class:`VocabularyState`
+        * owner - an identity of the cache the responses came from
+
+        """
+        key = self._key(uris, versions, owner)
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._count_in(key)
+        return state
+
+    def intern(self, state, owner=None):
+        """
+        Return the interned state for the uris and versions of this state,
+        counting it in; the state is interned, read-only, if there is none
+        yet.
+
+        """
+        key = self._key(state.uris, state.version, owner)
+        with self._lock:
+            if key not in self._states:
+                if isinstance(state.graph, OverlayGraph):
+                    state.graph.freeze()
+                elif not isinstance(state.graph, rdflib.graph.ReadOnlyGraphAggregate):
+                    state.graph = rdflib.graph.ReadOnlyGraphAggregate([state.graph])
+                state.registry_key = key
+                self._states[key] = state
+                self._counts[key] = 0
+            self._count_in(key)
+            return self._states[key]
+
+    def release(self, state):
+        """
+        Count the state out, dropping it if it is no longer in use.
+
+        """
+        key = state.registry_key
+        with self._lock:
+            if key is not None and self._states.get(key) is state:
+                self._counts[key] -= 1
+                if self._counts[key] <= 0:
+                    del self._states[key]
+                    del self._counts[key]
+
+
+vocabulary_registry = VocabularyRegistry()
+
+
+class TermResolver(object):
+    def __init__(self, baseuri, prefixes, alias_index, maxsize=8192,
+                 properties=None):
+        """
+        Expands attribute names and values into URIs for all the resources
+        of a load, remembering the most recently used expansions.
+
+        Args:
+        * baseuri - the base URI of the load, for names with no other URI
+        * prefixes - a :class:`PrefixMap`, or a dictionary of prefix
+                     definitions keyed 'pref__'
+        * alias_index - a :class:`AliasIndex` of the alias graph
+        * maxsize - the number of expansions of each kind to keep
+        * properties - the :class:`PropertyClasses` of the alias graph
+
+        """
+        if not isinstance(prefixes, PrefixMap):
+            prefixes = PrefixMap(prefixes)
+        self.baseuri = baseuri
+        self.prefix_map = prefixes
+        self.alias_index = alias_index
+        self.maxsize = maxsize
+        self.properties = properties
+        self._predicates = OrderedDict()
+        self._rdfobjects = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {'predicate': 0, 'rdfobject': 0}
+        self.misses = {'predicate': 0, 'rdfobject': 0}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_lock')
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _expand_prefix(self, astring):
+        result = astring
+        prefix, suffix = _prefix_suffix.match(astring).groups()
+        self.prefix_map.validate()
+        namespace = self.prefix_map.get(prefix)
+        if namespace is not None and _http_uri.match(namespace):
+            result = astring.replace('{}__'.format(prefix), namespace)
+        return result
+
+    def _remember(self, kind, memo, key, expand):
+        with self._lock:
+            if key in memo:
+                memo.move_to_end(key)
+                self.hits[kind] += 1
+                return memo[key]
+            self.misses[kind] += 1
+        result = expand()
+        with self._lock:
+            memo[key] = result
+            while len(memo) > self.maxsize:
+                memo.popitem(last=False)
+        return result
+
+    def unpack_predicate(self, astring):
+        if not isinstance(astring, six.string_types):
+            return self.baseuri + astring
+        return self._remember('predicate', self._predicates, astring,
+                              lambda: self._unpack_predicate(astring))
+
+    def _unpack_predicate(self, astring):
+        result = astring
+        if _prefix_suffix.match(astring):
+            result = self._expand_prefix(astring)
+        else:
+            alias = self.alias_index.predicate(astring)
+            if alias is not None:
+                result = alias
+        if result == astring:
+            result = self.baseuri + result
+        return result
+
+    def unpack_rdfobject(self, astring, predicate):
+        if not isinstance(astring, six.string_types):
+            return astring
+        return self._remember('rdfobject', self._rdfobjects,
+                              (astring, predicate),
+                              lambda: self._unpack_rdfobject(astring,
+                                                             predicate))
+
+    def _unpack_rdfobject(self, astring, predicate):
+        result = astring
+        if _prefix_suffix.match(astring):
+            result = self._expand_prefix(astring)
+        else:
+            # predicate can be a file uri too
+            try:
+                alias = self.alias_index.rdfobject(astring, predicate)
+                if alias is not None:
+                    result = alias
+            except ValueError:
+                pass
+        return result
+
+    def resolve(self, names, values):
+        """
+        Resolve all the names and (value, predicate) pairs in one pass,
+        each distinct one once, keeping the results among the remembered
+        expansions.  Names with more than one alias are left out, so that
+        expanding them still raises ValueError.
+
+        Args:
+        * names - attribute names, to expand as predicates
+        * values - (value, predicate) pairs, to expand as rdf objects
+
+        Returns a dictionary of name to predicate URI and a dictionary of
+        (value, predicate) to rdf object.
+
+        """
+        predicates = {}
+        rdfobjects = {}
+        for name in set(names):
+            try:
+                predicates[name] = self.unpack_predicate(name)
+            except ValueError:
+                continue
+        for key in set(values):
+            rdfobjects[key] = self.unpack_rdfobject(*key)
+        return predicates, rdfobjects
+
+    def summary(self):
+        """
+        Return a dictionary of hits, misses and hit rate for each kind of
+        expansion.
+
+        """
+        result = {}
+        for kind in ('predicate', 'rdfobject'):
+            total = self.hits[kind] + self.misses[kind]
+            result[kind] = {'hits': self.hits[kind],
+                            'misses': self.misses[kind],
+                            'hit_rate': self.hits[kind] / total if total else 0.0}
+        return result
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import netCDF4
+
+import bald
+from bald.tests import BaldTestCase
+
+
+def _make_file(path):
+    f = netCDF4.Dataset(path, "w", format="NETCDF4")
+    f.rdf__type = 'bald__Container'
+    group_pref = f.createGroup('prefix_list')
+    group_pref.bald__ = 'https://www.opengis.net/def/binary-array-ld/'
+    group_pref.rdf__ = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+    f.bald__isPrefixedBy = 'prefix_list'
+    f.createDimension('n', 3)
+    var = f.createVariable('v', 'f4', ('n',))
+    var.long_name = 'a variable'
+    f.close()
+
+
+def _exit_on_c(apath):
+    # a baseuri which kills the worker process loading c.nc
+    if apath.endswith('c.nc'):
+        os._exit(1)
+    return 'http://example.org/{}'.format(os.path.basename(apath))
+
+
+class Test(BaldTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ['a.nc', 'b.nc']:
+            _make_file(os.path.join(self.directory, name))
+        with open(os.path.join(self.directory, 'c.nc'), 'w') as fout:
+            fout.write('not a netCDF file')
+        self.cache = bald.HttpCache(offline=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_many(self):
+        pattern = os.path.join(self.directory, '*.nc')
+        for processes in [0, 2]:
+            with self.subTest(processes=processes):
+                results = bald.load_many(pattern, cache=self.cache,
+                                         processes=processes, output='nt')
+                self.assertEqual([os.path.basename(r.path) for r in results],
+                                 ['a.nc', 'b.nc', 'c.nc'])
+                self.assertIsNone(results[0].error)
+                self.assertIn('"a variable"', results[0].result)
+                self.assertIsNone(results[2].result)
+                self.assertIn('OSError', results[2].error)
+
+    def test_iter_load_containers(self):
+        paths = [os.path.join(self.directory, 'b.nc')]
+        results = list(bald.iter_load(paths, cache=self.cache, processes=1))
+        self.assertEqual(len(results), 1)
+        self.assertIsInstance(results[0].result, bald.Container)
+        self.assertEqual(len(results[0].result.rdfgraph()),
+                         len(bald.load_netcdf(paths[0], cache=self.cache).rdfgraph()))
+
+    def test_glob_characters(self):
+        _make_file(os.path.join(self.directory, 'run[1].nc'))
+        pattern = os.path.join(self.directory, '*].nc')
+        results = bald.load_many(pattern, cache=self.cache, processes=0,
+                                 output='nt')
+        self.assertEqual([os.path.basename(r.path) for r in results],
+                         ['run[1].nc'])
+        self.assertIsNone(results[0].error)
+
+    def test_worker_dies(self):
+        pattern = os.path.join(self.directory, '*.nc')
+        results = bald.load_many(pattern, baseuri=_exit_on_c, cache=self.cache,
+                                 processes=2, output='nt')
+        self.assertIsNone(results[0].error)
+        self.assertIsNone(results[1].error)
+        self.assertIn('BrokenProcessPool', results[2].error)
+
+    def test_default_cache(self):
+        pattern = os.path.join(self.directory, '[ab].nc')
+        results = bald.load_many(pattern, processes=2)
+        self.assertEqual([len(r.result.rdfgraph()) for r in results],
+                         [len(bald.load_netcdf(r.path).rdfgraph())
+                          for r in results])
+        self.assertEqual(len(results[0].result.alias_graph), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
+from unittest import mock
 
 import h5py
 import netCDF4
 import numpy as np
+import rdflib.compare
 
 import bald
 from bald.tests import BaldTestCase
@@ -83,6 +85,77 @@ class TestArrayReference(BaldTestCase):
                              msg='{}  != {}'.format(exns, expected))
 
 
+class TestLazy(BaldTestCase):
+    def test_lazy(self):
+        with self.temp_filename('.nc') as tfile:
+            f = netCDF4.Dataset(tfile, "w", format="NETCDF4")
+            f = _fattrs(f)
+            f.title = 'lazy'
+            group = _create_parent_child(f.createGroup('sub'), (11, 17), (11, 17))
+            group.comment = 'a group'
+            f.close()
+            cache = bald.HttpCache(offline=True)
+            expected = bald.load_netcdf(tfile, cache=cache)
+            root = bald.load_netcdf(tfile, cache=cache, lazy=True)
+            self.assertEqual(root.title, 'lazy')
+            self.assertFalse(dict.__contains__(root.attrs, 'bald__contains'))
+            group, = root.bald__contains
+            self.assertEqual(group.comment, 'a group')
+            self.assertFalse(dict.__contains__(group.attrs, 'bald__contains'))
+            self.assertEqual(len(group.bald__contains), 2)
+            root = bald.load_netcdf(tfile, cache=cache, lazy=True)
+            self.assertTrue(rdflib.compare.isomorphic(root.rdfgraph(),
+                                                      expected.rdfgraph()))
+
+    def test_lazy_load_fails(self):
+        with self.temp_filename('.nc') as tfile:
+            f = netCDF4.Dataset(tfile, "w", format="NETCDF4")
+            f = _fattrs(f)
+            _create_parent_child(f.createGroup('sub'), (11, 17), (11, 17))
+            f.close()
+            cache = bald.HttpCache(offline=True)
+            expected = bald.load_netcdf(tfile, cache=cache)
+            load_members = bald._load_netcdf_members
+            calls = []
+
+            def fail_once(*args):
+                load_members(*args)
+                if not calls:
+                    calls.append(args)
+                    raise IOError('read failed')
+
+            with mock.patch.object(bald, '_load_netcdf_members', fail_once):
+                root = bald.load_netcdf(tfile, cache=cache, lazy=True)
+                with self.assertRaises(IOError):
+                    root.bald__contains
+                self.assertFalse(dict.__contains__(root.attrs, 'bald__contains'))
+                self.assertTrue(rdflib.compare.isomorphic(root.rdfgraph(),
+                                                          expected.rdfgraph()))
+
+    def test_deep_group_references(self):
+        with self.temp_filename('.nc') as tfile:
+            f = netCDF4.Dataset(tfile, "w", format="NETCDF4")
+            f = _fattrs(f)
+            f.createDimension('time', 3)
+            f.createVariable('time', 'i4', ('time',))
+            sub = f.createGroup('sub')
+            sub.createDimension('depth', 2)
+            sub.createVariable('depth', 'f4', ('depth',))
+            deeper = sub.createGroup('deeper')
+            deeper.createDimension('x', 4)
+            deeper.createVariable('x', 'i4', ('x',))
+            deeper.createVariable('salt', 'f4', ('x', 'depth', 'time'))
+            f.close()
+            root = bald.load_netcdf(tfile, cache=bald.HttpCache(offline=True))
+            salt, = [res for res in root.resources()
+                     if res.identity and res.identity.endswith('/salt')]
+            targets = set(target.identity for ref in salt.bald__references
+                          for target in ref.bald__target)
+            self.assertEqual(targets,
+                             set('file://{}/{}'.format(tfile, path) for path in
+                                 ['sub/deeper/x', 'sub/depth', 'time']))
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -1,7 +1,15 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 
 import h5py
 import numpy as np
+import rdflib
+import requests
 
 from bald.tests import BaldTestCase
 import bald
@@ -19,5 +27,315 @@ class TestHttpCache(unittest.TestCase):
         self.assertFalse(self.cache.check_uri(notauri))
 
 
+class TestHttpCacheDisk(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store_shared(self):
+        auri = 'http://example.org/vocab'
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = b'<rdf/>'
+        bald.HttpCache(cache_dir=self.directory).store.set(auri, response)
+        cache = bald.HttpCache(cache_dir=self.directory)
+        self.assertTrue(cache.check_uri(auri))
+        self.assertEqual(cache[auri].content, b'<rdf/>')
+
+
+class SlowHttpCache(bald.HttpCache):
+    def _fetch(self, item):
+        time.sleep(0.2)
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = item.encode('utf-8')
+        return response
+
+
+class TestHttpCachePrefetch(unittest.TestCase):
+    def test_prefetch_concurrent(self):
+        cache = SlowHttpCache(max_workers=8)
+        uris = ['http://example.org/{}'.format(i) for i in range(8)]
+        start = time.time()
+        cache.prefetch(uris + uris + ['not a uri'])
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(set(cache.cache), set(uris))
+
+
+class TestHttpCacheSession(unittest.TestCase):
+    def test_thread_sessions_share_pool(self):
+        cache = bald.HttpCache(pool_maxsize=4)
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(cache.session))
+        thread.start()
+        thread.join()
+        self.assertIs(cache.session, cache.session)
+        self.assertIsNot(cache.session, sessions[0])
+        self.assertIs(cache.session.get_adapter('https://example.org'),
+                      sessions[0].get_adapter('https://example.org'))
+
+    def test_given_session(self):
+        session = requests.Session()
+        cache = bald.HttpCache(session=session)
+        self.assertIs(cache.session, session)
+
+
+class DeadSession(object):
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, uri, headers=None, timeout=None):
+        self.calls += 1
+        raise requests.exceptions.ConnectionError(uri)
+
+
+class TestHttpCacheFailures(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_negative_cache_persisted(self):
+        auri = 'http://example.org/dead'
+        session = DeadSession()
+        cache = bald.HttpCache(cache_dir=self.directory, session=session)
+        self.assertFalse(cache.check_uri(auri))
+        self.assertEqual(session.calls, 2)
+        failure = cache.store.get_failure(auri)
+        self.assertEqual(failure['failures'], 1)
+        # a later process backs off, without a request
+        session = DeadSession()
+        cache = bald.HttpCache(cache_dir=self.directory, session=session)
+        self.assertFalse(cache.check_uri(auri))
+        self.assertEqual(session.calls, 0)
+
+    def test_circuit_breaker(self):
+        session = DeadSession()
+        cache = bald.HttpCache(session=session, breaker_threshold=2,
+                               retry_budget=0)
+        for i in range(5):
+            cache['http://example.org/{}'.format(i)]
+        self.assertEqual(session.calls, 2)
+
+    def test_retry_budget(self):
+        session = DeadSession()
+        cache = bald.HttpCache(session=session, retry_budget=0)
+        cache['http://example.org/dead']
+        self.assertEqual(session.calls, 1)
+
+
+class ConditionalSession(object):
+    def __init__(self):
+        self.requests = []
+
+    def get(self, uri, headers=None, timeout=None):
+        self.requests.append(headers)
+        response = requests.models.Response()
+        if headers.get('If-None-Match') == '"v1"':
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response._content = b'<rdf/>'
+            response.headers['ETag'] = '"v1"'
+        return response
+
+
+class TestHttpCacheRevalidation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.auri = 'http://example.org/vocab'
+        cache = bald.HttpCache(cache_dir=self.directory,
+                               session=ConditionalSession())
+        cache[self.auri]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_not_modified(self):
+        session = ConditionalSession()
+        cache = bald.HttpCache(cache_dir=self.directory, ttl=-1,
+                               session=session)
+        self.assertEqual(cache[self.auri].content, b'<rdf/>')
+        self.assertEqual(session.requests[0]['If-None-Match'], '"v1"')
+
+    def test_stale_while_revalidate(self):
+        session = ConditionalSession()
+        cache = bald.HttpCache(cache_dir=self.directory, ttl=60,
+                               session=session, stale_while_revalidate=True)
+        cache.store.ttl = -1
+        self.assertEqual(cache[self.auri].content, b'<rdf/>')
+        cache.wait()
+        cache.store.ttl = 60
+        self.assertEqual(len(session.requests), 1)
+        self.assertIn(self.auri, cache.store)
+
+    def test_stale_if_error(self):
+        session = StatusSession(503)
+        cache = bald.HttpCache(cache_dir=self.directory, ttl=-1,
+                               session=session)
+        self.assertEqual(cache[self.auri].content, b'<rdf/>')
+        self.assertEqual(cache.store.get_failure(self.auri)['failures'], 1)
+        # the stored response is kept, and not revalidated while backing off
+        session = StatusSession(404)
+        cache = bald.HttpCache(cache_dir=self.directory, ttl=-1,
+                               session=session)
+        self.assertEqual(cache[self.auri].content, b'<rdf/>')
+        self.assertEqual(session.calls, 0)
+
+    def test_unreachable_backs_off(self):
+        session = DeadSession()
+        cache = bald.HttpCache(cache_dir=self.directory, ttl=-1,
+                               session=session, retry_budget=0)
+        self.assertEqual(cache[self.auri].content, b'<rdf/>')
+        self.assertEqual(session.calls, 1)
+        cache = bald.HttpCache(cache_dir=self.directory, ttl=-1,
+                               session=session, retry_budget=0)
+        self.assertEqual(cache[self.auri].content, b'<rdf/>')
+        self.assertEqual(session.calls, 1)
+
+
+class StatusSession(object):
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def get(self, uri, headers=None, timeout=None):
+        self.calls += 1
+        response = requests.models.Response()
+        response.status_code = self.status
+        response._content = b'error'
+        return response
+
+
+class TurtleSession(object):
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, uri, headers=None, timeout=None):
+        self.calls += 1
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = b'<http://a> <http://b> <http://c> .'
+        return response
+
+
+class TestHttpCacheGraph(unittest.TestCase):
+    def test_graph_cached(self):
+        session = TurtleSession()
+        cache = bald.HttpCache(session=session)
+        agraph = cache.graph('http://example.org/vocab')
+        self.assertEqual(len(agraph), 1)
+        self.assertEqual(cache.graph_formats['http://example.org/vocab'], 'n3')
+        self.assertIs(cache.graph('http://example.org/vocab'), agraph)
+        self.assertEqual(session.calls, 1)
+        with self.assertRaises(rdflib.graph.ModificationException):
+            agraph.add((rdflib.URIRef('http://a'), rdflib.URIRef('http://b'),
+                        rdflib.URIRef('http://d')))
+
+    def test_graph_unparseable(self):
+        cache = bald.HttpCache(session=TurtleSession())
+        self.assertIsNone(cache.graph('http://example.org/vocab',
+                                      formats=('xml',)))
+
+    def test_versions(self):
+        cache = bald.HttpCache(session=TurtleSession())
+        other = bald.HttpCache(session=StatusSession(503))
+        uris = ['http://example.org/b', 'http://example.org/a']
+        versions = cache.versions(uris)
+        self.assertEqual([uri for uri, version in versions], sorted(uris))
+        self.assertTrue(versions[0][1].startswith('sha256:'))
+        self.assertEqual(bald.HttpCache(session=TurtleSession()).versions(uris),
+                         versions)
+        self.assertEqual(other.versions(uris),
+                         tuple((uri, None) for uri in sorted(uris)))
+        cache.cache['http://example.org/a'].headers['ETag'] = '"1"'
+        cache._versions.clear()
+        self.assertEqual(cache.version('http://example.org/a'), 'etag:"1"')
+
+
+class HeadSession(TurtleSession):
+    def __init__(self):
+        super(HeadSession, self).__init__()
+        self.heads = 0
+
+    def head(self, uri, timeout=None, allow_redirects=False):
+        self.heads += 1
+        response = requests.models.Response()
+        response.status_code = 200 if uri.endswith('/head') else 405
+        return response
+
+
+class TestHttpCacheCheckUris(unittest.TestCase):
+    def test_head_then_get(self):
+        session = HeadSession()
+        cache = bald.HttpCache(session=session)
+        uris = ['http://example.org/head', 'http://example.org/get',
+                'http://example.org/head']
+        results = cache.check_uris(uris)
+        self.assertEqual(results, {'http://example.org/head': True,
+                                   'http://example.org/get': True})
+        self.assertEqual(session.heads, 2)
+        self.assertEqual(session.calls, 1)
+        self.assertNotIn('http://example.org/head', cache.cache)
+
+
+class TestHttpCacheStats(unittest.TestCase):
+    def test_counts(self):
+        events = []
+        cache = bald.HttpCache(session=TurtleSession(), on_event=events.append)
+        auri = 'http://example.org/vocab'
+        cache.graph(auri)
+        cache[auri]
+        summary = cache.stats.summary()
+        self.assertEqual(summary['miss'], 1)
+        self.assertEqual(summary['hit'], 1)
+        self.assertEqual(summary['bytes'], 34)
+        self.assertEqual(summary['uris'][auri]['parse'], 2)
+        self.assertEqual(sum(count for _, count in summary['fetch_latency']), 1)
+        self.assertEqual([e['event'] for e in events],
+                         ['miss', 'parse', 'parse', 'hit'])
+        self.assertEqual(cache.stats.slowest(1)[0][0], auri)
+
+
+class TestHttpCacheOffline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_offline_bundle(self):
+        auri = 'http://example.org/vocab'
+        path = os.path.join(self.directory, 'vocabs.zip')
+        cache = bald.HttpCache(session=TurtleSession())
+        bald.cachestore.write_bundle(path, {auri: cache[auri]})
+        session = TurtleSession()
+        cache = bald.HttpCache(bundle=path, offline=True, session=session)
+        self.assertEqual(len(cache.graph(auri)), 1)
+        self.assertFalse(cache.check_uri('http://example.org/other'))
+        self.assertEqual(session.calls, 0)
+
+
+class TestHttpCacheContexts(unittest.TestCase):
+    def test_context_prefixes(self):
+        cache = bald.HttpCache()
+        first = json.dumps({'@context': {'ex': 'http://example.org/a/',
+                                         'skos': 'http://www.w3.org/2004/02/skos/core#'}})
+        second = json.dumps({'@context': {'ex': 'http://example.org/b/'}})
+        prefixes = cache.context_prefixes([first, second])
+        self.assertEqual(prefixes,
+                         {'skos__': 'http://www.w3.org/2004/02/skos/core#'})
+        self.assertIs(cache.context_prefixes([first, second]), prefixes)
+        self.assertEqual(cache.context_prefixes([first])['ex__'],
+                         'http://example.org/a/')
+        prefix_map = cache.context_prefix_map([first, second])
+        self.assertEqual(dict(prefix_map.items()),
+                         {'skos': 'http://www.w3.org/2004/02/skos/core#'})
+        self.assertIs(cache.context_prefix_map([first, second]), prefix_map)
+
+
 if __name__ == '__main__':
     unittest.main()
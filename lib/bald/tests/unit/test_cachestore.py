@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+
+from bald import cachestore
+
+
+def _response(text, status_code=200):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response._content = text.encode('utf-8')
+    response.encoding = 'utf-8'
+    return response
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        store = cachestore.DiskCache(self.directory)
+        store.set('http://example.org/a', _response('<rdf/>'))
+        response = cachestore.DiskCache(self.directory).get('http://example.org/a')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, '<rdf/>')
+
+    def test_ttl_expiry(self):
+        store = cachestore.DiskCache(self.directory, ttl=60)
+        store.set('http://example.org/a', _response('<rdf/>'))
+        self.assertIn('http://example.org/a', store)
+        store.ttl = -1
+        self.assertIsNone(store.get('http://example.org/a'))
+
+    def test_lru_eviction(self):
+        store = cachestore.DiskCache(self.directory)
+        store.set('http://example.org/a', _response('a' * 1000))
+        store.set('http://example.org/b', _response('b' * 1000))
+        # make 'a' the least recently used entry
+        past = time.time() - 100
+        os.utime(store._path('http://example.org/a'), (past, past))
+        store.max_size = store.size() - 1
+        store.evict()
+        self.assertNotIn('http://example.org/a', store)
+        self.assertIn('http://example.org/b', store)
+
+
+class TestSqliteCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        store = cachestore.SqliteCache(self.path)
+        store.set('http://example.org/a', _response('<rdf/>'))
+        response = cachestore.SqliteCache(self.path).get('http://example.org/a')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, '<rdf/>')
+
+    def test_lru_eviction(self):
+        store = cachestore.SqliteCache(self.path, max_size=1500)
+        store.set('http://example.org/a', _response('a' * 1000))
+        store.set('http://example.org/b', _response('b' * 1000))
+        self.assertNotIn('http://example.org/a', store)
+        self.assertIn('http://example.org/b', store)
+
+    def test_single_writer_claim(self):
+        first = cachestore.SqliteCache(self.path)
+        second = cachestore.SqliteCache(self.path, poll_interval=0.01)
+        self.assertTrue(first.claim('http://example.org/a'))
+        self.assertFalse(second.claim('http://example.org/a'))
+        first.set('http://example.org/a', _response('<rdf/>'))
+        first.release('http://example.org/a')
+        self.assertEqual(second.wait_for('http://example.org/a').text, '<rdf/>')
+        self.assertTrue(second.claim('http://example.org/a'))
+
+
+class TestVocabularyBundle(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        responses = {'http://example.org/a': _response('<a/>'),
+                     'http://example.org/b': _response('<b/>')}
+        for name in ['bundle.zip', 'bundle']:
+            path = os.path.join(self.directory, name)
+            cachestore.write_bundle(path, responses)
+            bundle = cachestore.VocabularyBundle(path)
+            with self.subTest(name=name):
+                self.assertEqual(bundle.uris(), sorted(responses))
+                self.assertEqual(bundle.get('http://example.org/b').text, '<b/>')
+                self.assertIsNone(bundle.get('http://example.org/c'))
+            bundle.close()
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        uris = ['http://example.org/b', 'http://example.org/a']
+        versions = (('http://example.org/a', 'etag:1'),
+                    ('http://example.org/b', 'etag:2'))
+        store = cachestore.SnapshotStore(self.directory)
+        store.set(uris, versions, {'state': [1, 2]})
+        store = cachestore.SnapshotStore(self.directory)
+        self.assertEqual(store.get(reversed(uris), versions), {'state': [1, 2]})
+        self.assertIsNone(store.get(uris[:1], versions[:1]))
+
+    def test_versions(self):
+        uris = ['http://example.org/a']
+        store = cachestore.SnapshotStore(self.directory)
+        store.set(uris, [(uris[0], 'etag:1')], 'state')
+        self.assertIsNone(store.get(uris, [(uris[0], 'etag:2')]))
+        self.assertEqual(store.get(uris, [(uris[0], 'etag:1')]), 'state')
+
+    def test_ttl(self):
+        versions = [('http://example.org/a', 'etag:1')]
+        store = cachestore.SnapshotStore(self.directory, ttl=0.1)
+        store.set(['http://example.org/a'], versions, 'state')
+        time.sleep(0.2)
+        self.assertIsNone(store.get(['http://example.org/a'], versions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import netCDF4
+import numpy as np
+import rdflib.compare
+
+import bald
+from bald import cdf
+
+
+def _make_file(path, fmt):
+    f = netCDF4.Dataset(path, "w", format=fmt)
+    f.title = 'a classic file'
+    f.levels = np.array([1, 2, 3], dtype='i2')
+    f.createDimension('time', None)
+    f.createDimension('x', 3)
+    time = f.createVariable('time', 'f8', ('time',))
+    time.units = 'hours'
+    xvar = f.createVariable('x', 'i4', ('x',))
+    masked = f.createVariable('masked', 'f4', ('x',), fill_value=-1.)
+    packed = f.createVariable('packed', 'i2', ('time', 'x'))
+    packed.scale_factor = 0.5
+    f.createVariable('crs', 'i4')
+    time[:] = [0., 1., 2., 3.]
+    xvar[:] = [10, 20, 30]
+    masked[:] = [1., -1., 2.]
+    packed[:] = np.arange(12).reshape(4, 3)
+    f.close()
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = {}
+        for fmt in ['NETCDF3_CLASSIC', 'NETCDF3_64BIT_OFFSET',
+                    'NETCDF3_64BIT_DATA']:
+            path = os.path.join(self.directory, '{}.nc'.format(fmt))
+            _make_file(path, fmt)
+            self.paths[fmt] = path
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_is_classic(self):
+        self.assertTrue(cdf.is_classic(self.paths['NETCDF3_CLASSIC']))
+        path = os.path.join(self.directory, 'nc4.nc')
+        netCDF4.Dataset(path, 'w', format='NETCDF4').close()
+        self.assertFalse(cdf.is_classic(path))
+
+    def test_parity(self):
+        for fmt, path in self.paths.items():
+            with self.subTest(fmt=fmt):
+                with netCDF4.Dataset(path) as expected, cdf.Dataset(path) as actual:
+                    self.assertEqual(actual.data_model, fmt)
+                    self.assertEqual(actual.ncattrs(), expected.ncattrs())
+                    self.assertEqual(actual.title, expected.title)
+                    np.testing.assert_array_equal(actual.levels, expected.levels)
+                    self.assertEqual(list(actual.variables), list(expected.variables))
+                    for name, evar in expected.variables.items():
+                        avar = actual[name]
+                        self.assertEqual(avar.dimensions, evar.dimensions)
+                        self.assertEqual(avar.shape, evar.shape)
+                        self.assertEqual(avar.dtype, evar.dtype)
+                        self.assertEqual(avar.__dict__.keys(), evar.__dict__.keys())
+                        if evar.shape:
+                            for index in [0, -1, slice(None)]:
+                                np.testing.assert_array_equal(avar[index], evar[index])
+                    self.assertIs(actual['masked'][1], np.ma.masked)
+                    self.assertEqual(actual['packed'][-1, -1], 11.)
+
+    def test_close(self):
+        dataset = cdf.Dataset(self.paths['NETCDF3_CLASSIC'])
+        levels = dataset.levels
+        scale = dataset['packed'].scale_factor
+        dataset.close()
+        self.assertTrue(dataset._buf.closed)
+        self.assertTrue(dataset._file.closed)
+        self.assertTrue(levels.dtype.isnative)
+        np.testing.assert_array_equal(levels, [1, 2, 3])
+        self.assertEqual(scale, 0.5)
+
+    def test_load_netcdf(self):
+        cache = bald.HttpCache(offline=True)
+        for path in self.paths.values():
+            expected = bald.load_netcdf(path, baseuri='http://example.org/f',
+                                        cache=cache)
+            actual = bald.load_netcdf(path, baseuri='http://example.org/f',
+                                      cache=cache, backend='cdf')
+            self.assertTrue(rdflib.compare.isomorphic(actual.rdfgraph(),
+                                                      expected.rdfgraph()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+import netCDF4
+import numpy as np
+
+import bald
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp('.nc')
+        os.close(handle)
+        self.dataset = netCDF4.Dataset(self.path, 'w')
+        self.fill = netCDF4.default_fillvals['f4']
+
+    def tearDown(self):
+        self.dataset.close()
+        os.remove(self.path)
+
+    def _variable(self, name, values, dtype='f4', **attrs):
+        self.dataset.createDimension(name, len(values))
+        fill_value = attrs.pop('_FillValue', None)
+        var = self.dataset.createVariable(name, dtype, (name,),
+                                          fill_value=fill_value)
+        for attr, value in attrs.items():
+            setattr(var, attr, value)
+        var.set_auto_maskandscale(False)
+        var[:] = np.array(values, dtype=dtype)
+        var.set_auto_maskandscale(True)
+        return var
+
+    def assertEndpoints(self, var):
+        expected = [var[0], var[-1] if len(var) > 1 else None]
+        result = bald._coordinate_endpoints(var)
+        for value, expected_value in zip(result, expected):
+            if expected_value is None or expected_value is np.ma.masked:
+                self.assertIs(value, expected_value)
+            else:
+                self.assertIs(type(value), type(expected_value))
+                self.assertEqual(value, expected_value)
+
+    def test_raw(self):
+        var = self._variable('x', [1.5, 2., 3.5])
+        self.assertEndpoints(var)
+        self.assertTrue(var.mask and var.scale)
+
+    def test_default_fill(self):
+        self.assertEndpoints(self._variable('x', [self.fill, 2.]))
+        self.assertEndpoints(self._variable('y', [1, 2], dtype='i1'))
+
+    def test_masked_and_scaled(self):
+        self.assertEndpoints(self._variable('x', [-1., 2.], _FillValue=-1.))
+        self.assertEndpoints(self._variable('y', [3, 4, 5], dtype='i2',
+                                            scale_factor=0.5))
+        self.assertEndpoints(self._variable('z', [0, 7], dtype='i4',
+                                            valid_min=1))
+
+    def test_single(self):
+        self.assertEndpoints(self._variable('x', [4.]))
+
+
+if __name__ == '__main__':
+    unittest.main()
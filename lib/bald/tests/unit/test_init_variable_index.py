@@ -0,0 +1,52 @@
+import unittest
+
+import bald
+
+
+class netcdfGroupMin(object):
+    def __init__(self, path, variables, groups=()):
+        self.path = path
+        self.variables = dict((name, path) for name in variables)
+        self.groups = dict((group.path.rsplit('/', 1)[1], group)
+                           for group in groups)
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        deeper = netcdfGroupMin('/sub/deeper', ['x', 'lat'])
+        sub = netcdfGroupMin('/sub', ['lat', 'depth'], [deeper])
+        other = netcdfGroupMin('/other', ['depth'])
+        root = netcdfGroupMin('/', ['lat', 'time'], [sub, other])
+        self.index = bald._VariableIndex(root)
+        for path in self.index.variables:
+            self.index.resources[path] = path
+
+    def test_paths(self):
+        self.assertEqual(sorted(self.index.variables),
+                         ['/lat', '/other/depth', '/sub/deeper/lat',
+                          '/sub/deeper/x', '/sub/depth', '/sub/lat',
+                          '/time'])
+
+    def test_nearest_scope(self):
+        self.assertEqual(self.index.resolve('/sub/deeper', 'lat'),
+                         '/sub/deeper/lat')
+        self.assertEqual(self.index.resolve('/sub/deeper', 'depth'),
+                         '/sub/depth')
+        self.assertEqual(self.index.resolve('/sub/deeper', 'time'), '/time')
+        self.assertEqual(self.index.resolve('/sub', 'lat'), '/sub/lat')
+        self.assertIsNone(self.index.resolve('/', 'depth'))
+
+    def test_path_names(self):
+        self.assertEqual(self.index.resolve('/sub/deeper', '/lat'), '/lat')
+        self.assertEqual(self.index.resolve('/sub', 'deeper/x'), None)
+        self.assertIsNone(self.index.resolve('/sub', '/other/depth'))
+
+    def test_unloaded(self):
+        del self.index.resources['/sub/depth']
+        self.assertIsNone(self.index.resource('/sub/deeper', 'depth'))
+        self.assertEqual(self.index.variable('/sub/deeper', 'x'),
+                         '/sub/deeper')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+import unittest
+
+import rdflib
+import rdflib.graph
+
+import bald
+from bald import terms
+
+ALIASES = """
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix ex: <http://def.example.org/> .
+
+ex:standard_name a rdf:Property ;
+    dct:identifier "standard_name" ;
+    rdfs:range ex:StandardName .
+ex:units a rdf:Property, owl:ObjectProperty ;
+    dct:identifier "units" .
+ex:air_temperature a ex:StandardName ;
+    dct:identifier "air_temperature" .
+ex:time a ex:StandardName ;
+    dct:identifier "time" .
+ex:time_again a ex:StandardName ;
+    dct:identifier "time" .
+ex:label a rdf:Property ;
+    dct:identifier "label"@en .
+"""
+
+
+class TestPrefixMap(unittest.TestCase):
+    def setUp(self):
+        self.prefixes = {'ex__': 'http://ex.example.org/terms/',
+                         'skos__': 'http://www.w3.org/2004/02/skos/core#',
+                         'plain': 'http://not.a.prefix/',
+                         'local__': 'not/a/uri/'}
+
+    def test_lookup(self):
+        pmap = terms.PrefixMap(self.prefixes)
+        self.assertEqual(sorted(pmap), ['ex', 'skos'])
+        self.assertEqual(pmap['ex'], 'http://ex.example.org/terms/')
+        self.assertNotIn('plain', pmap)
+        self.assertNotIn('local', pmap)
+
+    def test_hashable(self):
+        pmap = terms.PrefixMap(self.prefixes)
+        other = terms.PrefixMap(dict(reversed(list(self.prefixes.items()))))
+        self.assertEqual(pmap, other)
+        self.assertEqual({pmap: 1}[other], 1)
+        with self.assertRaises(AttributeError):
+            pmap.extra = 1
+
+    def test_conflict(self):
+        pmap = terms.PrefixMap({'ex__': 'http://ex.example.org/a/',
+                                'ex___': 'http://ex.example.org/b/'})
+        with self.assertRaises(ValueError):
+            pmap.validate()
+
+    def test_base(self):
+        base = terms.PrefixMap({'ex__': 'http://ex.example.org/a/',
+                                'skos__': 'http://www.w3.org/2004/02/skos/core#',
+                                'dct__': 'http://purl.org/dc/terms/'})
+        pmap = terms.PrefixMap({'ex__': 'http://ex.example.org/b/',
+                                'dct__': 'not/a/uri/'}, base=base)
+        self.assertEqual(dict(pmap.items()),
+                         {'ex': 'http://ex.example.org/b/',
+                          'skos': 'http://www.w3.org/2004/02/skos/core#'})
+        self.assertEqual(base['ex'], 'http://ex.example.org/a/')
+        pmap.validate()
+        conflict = terms.PrefixMap({'ex___': 'http://ex.example.org/b/'},
+                                   base=base)
+        with self.assertRaises(ValueError):
+            conflict.validate()
+
+
+class TestAliasIndex(unittest.TestCase):
+    def setUp(self):
+        graph = rdflib.Graph()
+        graph.parse(data=ALIASES, format='n3')
+        self.index = terms.AliasIndex(graph)
+
+    def test_predicate(self):
+        self.assertEqual(self.index.predicate('standard_name'),
+                         'http://def.example.org/standard_name')
+        self.assertIsNone(self.index.predicate('long_name'))
+        self.assertIsNone(self.index.predicate('label'))
+
+    def test_predicate_multiple(self):
+        # one match for each property type, as the SPARQL query gave
+        with self.assertRaises(ValueError):
+            self.index.predicate('units')
+
+    def test_rdfobject(self):
+        pred = 'http://def.example.org/standard_name'
+        self.assertEqual(self.index.rdfobject('air_temperature', pred),
+                         'http://def.example.org/air_temperature')
+        self.assertIsNone(self.index.rdfobject('air_temperature',
+                                               'http://def.example.org/units'))
+        with self.assertRaises(ValueError):
+            self.index.rdfobject('time', pred)
+
+
+class TestTermResolver(unittest.TestCase):
+    def setUp(self):
+        graph = rdflib.Graph()
+        graph.parse(data=ALIASES, format='n3')
+        prefixes = {'ex__': 'http://ex.example.org/terms/'}
+        self.resolver = terms.TermResolver('http://example.org/f/', prefixes,
+                                           terms.AliasIndex(graph), maxsize=2)
+
+    def test_unpack(self):
+        self.assertEqual(self.resolver.unpack_predicate('ex__flavour'),
+                         'http://ex.example.org/terms/flavour')
+        self.assertEqual(self.resolver.unpack_predicate('long_name'),
+                         'http://example.org/f/long_name')
+        pred = self.resolver.unpack_predicate('standard_name')
+        self.assertEqual(self.resolver.unpack_rdfobject('air_temperature', pred),
+                         'http://def.example.org/air_temperature')
+        self.assertEqual(self.resolver.unpack_rdfobject('time', pred), 'time')
+
+    def test_hit_rate(self):
+        for name in ['comment', 'long_name', 'long_name', 'long_name']:
+            self.resolver.unpack_predicate(name)
+        summary = self.resolver.summary()['predicate']
+        self.assertEqual((summary['hits'], summary['misses']), (2, 2))
+        self.assertEqual(summary['hit_rate'], 0.5)
+
+    def test_lru(self):
+        for name in ['a', 'b', 'a', 'c', 'a', 'b']:
+            self.resolver.unpack_predicate(name)
+        self.assertEqual(list(self.resolver._predicates), ['a', 'b'])
+        self.assertEqual(self.resolver.misses['predicate'], 4)
+
+
+ONTOLOGY = """
+@prefix bald: <https://www.opengis.net/def/binary-array-ld/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+bald:Array rdfs:subClassOf bald:Resource .
+bald:contains a rdf:Property ; rdfs:range bald:Resource .
+bald:references a rdf:Property ; rdfs:range bald:Array .
+bald:shape a rdf:Property ; rdfs:range rdfs:Literal .
+bald:concept a rdf:Property ; rdfs:range skos:Concept .
+"""
+
+
+class TestPropertyClasses(unittest.TestCase):
+    def setUp(self):
+        self.graph = rdflib.Graph()
+        self.graph.parse(data=ONTOLOGY, format='n3')
+
+    def test_classes(self):
+        classes = terms.PropertyClasses(self.graph)
+        bald = 'https://www.opengis.net/def/binary-array-ld/'
+        self.assertEqual(classes.references,
+                         set([bald + 'contains', bald + 'references']))
+        self.assertEqual(classes.literals,
+                         set([bald + 'shape', bald + 'concept']))
+
+    def test_registry(self):
+        registry = terms.PropertyRegistry()
+        classes = registry.classes('v1', self.graph)
+        self.assertIs(registry.classes('v1', rdflib.Graph()), classes)
+        self.assertIsNot(registry.classes('v2', self.graph), classes)
+
+
+class TestResolveTerms(unittest.TestCase):
+    def test_container(self):
+        graph = rdflib.Graph()
+        graph.parse(data=ALIASES, format='n3')
+        prefixes = {'ex__': 'http://ex.example.org/terms/'}
+        base = 'http://example.org/f/'
+        resolver = terms.TermResolver(base, prefixes, terms.AliasIndex(graph))
+        var = bald.Array(base, base, 'temp',
+                         {'standard_name': 'air_temperature',
+                          'ex__flavour': set(['ex__vanilla', 'plain'])},
+                         prefixes=prefixes, resolver=resolver)
+        root = bald.Container(base, base, '', {'bald__contains': set([var])},
+                              prefixes=prefixes, resolver=resolver)
+        predicates, rdfobjects = root.resolve_terms()
+        # each distinct name is expanded once
+        self.assertEqual(resolver.misses['predicate'], len(predicates))
+        self.assertEqual(predicates['standard_name'],
+                         'http://def.example.org/standard_name')
+        flavour = 'http://ex.example.org/terms/flavour'
+        self.assertEqual(rdfobjects[('ex__vanilla', flavour)],
+                         'http://ex.example.org/terms/vanilla')
+        misses = dict(resolver.misses)
+        self.assertEqual(var.unpack_rdfobject('air_temperature',
+                                              predicates['standard_name']),
+                         'http://def.example.org/air_temperature')
+        self.assertEqual(resolver.misses, misses)
+
+
+class TestOverlayGraph(unittest.TestCase):
+    def test_overlay(self):
+        base = rdflib.Graph()
+        base.parse(data=ALIASES, format='n3')
+        shared = rdflib.graph.ReadOnlyGraphAggregate([base])
+        other = rdflib.Graph()
+        other.parse(data=ONTOLOGY, format='n3')
+        overlay = terms.OverlayGraph([shared, shared, other, base])
+        self.assertEqual(len(overlay), len(base) + len(other))
+        triple = (rdflib.URIRef('http://example.org/s'), rdflib.RDF.type,
+                  rdflib.OWL.Class)
+        overlay.add(triple)
+        self.assertIn(triple, overlay)
+        self.assertNotIn(triple, base)
+        self.assertEqual(len(overlay), len(base) + len(other) + 1)
+        overlay.freeze()
+        with self.assertRaises(rdflib.graph.ModificationException):
+            overlay.add(triple)
+
+
+class TestVocabularyRegistry(unittest.TestCase):
+    def test_refcount(self):
+        registry = terms.VocabularyRegistry()
+        uris = ['http://example.org/b', 'http://example.org/a']
+        graph = rdflib.Graph()
+        graph.parse(data=ALIASES, format='n3')
+        state = registry.intern(terms.VocabularyState(graph, uris))
+        with self.assertRaises(rdflib.graph.ModificationException):
+            state.graph.add((rdflib.URIRef('http://example.org/s'),
+                             rdflib.RDF.type, rdflib.OWL.Class))
+        self.assertIs(registry.get(reversed(uris)), state)
+        other = registry.intern(terms.VocabularyState(rdflib.Graph(), uris))
+        self.assertIs(other, state)
+        for _ in range(3):
+            self.assertEqual(len(registry), 1)
+            registry.release(state)
+        self.assertEqual(len(registry), 0)
+        self.assertIsNone(registry.get(uris))
+
+    def test_versions_and_owner(self):
+        registry = terms.VocabularyRegistry()
+        uris = ['http://example.org/a']
+        versions = (('http://example.org/a', 'etag:1'),)
+        state = registry.intern(terms.VocabularyState(rdflib.Graph(), uris,
+                                                      versions), owner='c1')
+        self.assertIs(registry.get(uris, versions, owner='c1'), state)
+        self.assertIsNone(registry.get(uris, versions, owner='c2'))
+        self.assertIsNone(registry.get(uris, (('http://example.org/a',
+                                               'etag:2'),), owner='c1'))
+        self.assertIsNone(registry.get(uris, owner='c1'))
@@ -71,6 +71,9 @@ class ResourceValidation(Validation):
         self.uris_resolve = False
         if uris_resolve == True:
             self.uris_resolve = True
+        # set by bald.validate, from one check of all the uris in a file
+        self.attr_uris = None
+        self.uri_results = None
 
     def is_valid(self):
         return not self.exceptions()
@@ -86,30 +89,46 @@ class ResourceValidation(Validation):
     def _extra_exceptions(self, exceptions):
         return exceptions
 
-    def check_attr_uris(self, exceptions):
-        def _check_uri(uri, exceptions):
-            if not self.cache.check_uri(uri):
-                msg = '{} is not resolving as a resource (404).'
-                msg = msg.format(uri)
-                exceptions.append(msg)
-            return exceptions
+    def find_attr_uris(self):
+        """
+        Return the list of URIs, in order and with repeats, which the
+        resource's prefixes, aliases and attributes refer to.
 
+        """
+        uris = []
         #''' Skip checking prefixes as whole graphs could be big!
         for pref, uri in self.resource.prefixes().items():
-            exceptions = _check_uri(uri, exceptions)
+            uris.append(uri)
         #'''
         for alias, uri in self.resource.aliases.items():
-            exceptions = _check_uri(uri, exceptions)
+            uris.append(uri)
         for attr, value in self.resource.attrs.items():
             att = ''
             if isinstance(attr, six.string_types):
                 att = self.resource.unpack_predicate(attr)
                 if self.cache.is_http_uri(att):
-                    exceptions = _check_uri(att, exceptions)
+                    uris.append(att)
             if isinstance(value, six.string_types):
                 val = self.resource.unpack_rdfobject(value, att)
                 if self.cache.is_http_uri(val):
-                    exceptions = _check_uri(val, exceptions)
+                    uris.append(val)
+        return uris
+
+    def check_attr_uris(self, exceptions):
+        uris = self.attr_uris
+        if uris is None:
+            uris = self.find_attr_uris()
+        uri_results = self.uri_results
+        if uri_results is None:
+            uri_results = self.cache.check_uris(uris)
+        for uri in uris:
+            result = uri_results.get(uri)
+            if result is None:
+                result = self.cache.check_uri(uri)
+            if not result:
+                msg = '{} is not resolving as a resource (404).'
+                msg = msg.format(uri)
+                exceptions.append(msg)
         return exceptions
 
     def check_attr_domain_range(self, exceptions):
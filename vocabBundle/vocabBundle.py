@@ -0,0 +1,32 @@
+import argparse
+import glob
+import json
+
+import bald
+
+
+def build(bundle_path, ncfiles, alias_file=None, prefix_contexts=None):
+    alias_dict = None
+    if alias_file is not None:
+        with open(alias_file, 'r') as f:
+            alias_dict = json.load(f)
+    afilepaths = []
+    for pattern in ncfiles:
+        afilepaths += sorted(glob.glob(pattern)) or [pattern]
+    uris = bald.build_vocabulary_bundle(afilepaths, bundle_path,
+                                        alias_dict=alias_dict,
+                                        prefix_contexts=prefix_contexts)
+    for uri in uris:
+        print(uri)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build a vocabulary bundle, for offline use, from the vocabularies used by a corpus of netCDF files.')
+    parser.add_argument('-a', action="store", dest="aliases", help="JSON file of aliases")
+    parser.add_argument('-c', action="append", dest="contexts", help="JSON-LD context (URL or JSON) of prefixes; may be repeated")
+    parser.add_argument("bundle", help="Path for the bundle: a directory, or a zip archive if it ends with .zip")
+    parser.add_argument("ncfiles", nargs='+', help="Paths or glob patterns for the netCDF files")
+
+    args = parser.parse_args()
+    build(args.bundle, args.ncfiles, alias_file=args.aliases,
+          prefix_contexts=args.contexts)